@@ -1,13 +1,52 @@
 import os
 import logging
 from config import Config
-from pyrogram import Client as LazyDeveloper
 logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logging.getLogger("pyrogram").setLevel(logging.WARNING)
 logger = logging.getLogger(__name__)
 
 
+async def bootstrap():
+    """Prepares the database before any update is handled."""
+    report = await clinton.ensure_indexes()
+    for collection, indexes in report.items():
+        logger.info(f"Indexes of {collection}: {', '.join(indexes) or 'none'}")
+    if "id_1" not in report.get(clinton.col.name, []):
+        logger.warning("USERS has no index on 'id', user lookups will scan the collection")
+    try:
+        await user_registry.warm()
+    except Exception as e:
+        logger.error(f"Failed to load registered users: {e}")
+    disk_manager.start_janitor()
+
+
+async def main(bot):
+    await bootstrap()
+    await bot.start()
+    await client_pool.start()
+    await idle()
+    # media sessions go first, some belong to the helper bots
+    await upload_engine.stop()
+    await client_pool.stop()
+    try:
+        await user_registry.flush()
+    except Exception as e:
+        logger.error(f"Failed to flush new users: {e}")
+    await bot.stop()
+    await close_session()
+
+
 if __name__ == "__main__" :
+    # imported here, not at the top: spawned yt-dlp and thumbnail workers run
+    # this file as __mp_main__ and must not load pyrogram or open a Mongo client
+    from pyrogram import Client as LazyDeveloper
+    from pyrogram import idle
+    from database.access import clinton
+    from database.user_registry import user_registry
+    from helper_funcs.disk_manager import disk_manager
+    from helper_funcs.client_pool import client_pool
+    from helper_funcs.upload_engine import upload_engine
+    from helper_funcs.help_uploadbot import close_session
     # create download directory, if not exist
     if not os.path.isdir(Config.DOWNLOAD_LOCATION):
         os.makedirs(Config.DOWNLOAD_LOCATION)
@@ -18,6 +57,6 @@ if __name__ == "__main__" :
       api_id=Config.API_ID,
       api_hash=Config.API_HASH,
       plugins=plugins)
-      Warrior.run()
+      Warrior.run(main(Warrior))
     except Exception as e:
       logger.error(f"Failed to start bot: {e}")
\ No newline at end of file
@@ -13,19 +13,89 @@ class Config(object):
     MAX_FILE_SIZE = 50000000
     TG_MAX_FILE_SIZE = 4194304000 #2097152000
     FREE_USER_MAX_FILE_SIZE = 50000000
-    # chunk size that should be used with requests
-    CHUNK_SIZE = int(os.environ.get("CHUNK_SIZE", 128))
+    # smallest read size used when streaming downloads
+    CHUNK_SIZE = int(os.environ.get("CHUNK_SIZE", 65536))
+    # largest read size the adaptive downloader will grow to
+    DDL_MAX_CHUNK_SIZE = int(os.environ.get("DDL_MAX_CHUNK_SIZE", 4194304))
+    # downloaded bytes are buffered up to this size before each disk write
+    DDL_WRITE_BUFFER_SIZE = int(os.environ.get("DDL_WRITE_BUFFER_SIZE", 4194304))
+    # parallel connections used for direct links that support range requests
+    DDL_CONNECTIONS = int(os.environ.get("DDL_CONNECTIONS", 8))
+    # direct links are never split into segments smaller than this
+    DDL_MIN_SEGMENT_SIZE = int(os.environ.get("DDL_MIN_SEGMENT_SIZE", 4194304))
+    # seconds a direct link gets to answer the size and range probe
+    DDL_PROBE_TIMEOUT = int(os.environ.get("DDL_PROBE_TIMEOUT", 15))
     # default thumbnail to be used in the videos
     # proxy for accessing youtube-dl in GeoRestricted Areas
     # Get your own proxy from https://github.com/rg3/youtube-dl/issues/1091#issuecomment-230163061
     HTTP_PROXY = ""
+    # seconds between progress edits of a status message
+    PROGRESS_UPDATE_INTERVAL = int(os.environ.get("PROGRESS_UPDATE_INTERVAL", 5))
     # maximum message length in Telegram
     MAX_MESSAGE_LENGTH = 4096
+    # upload direct links as files while they download, without saving them to disk
+    STREAM_UPLOADS = os.environ.get("STREAM_UPLOADS", "False").lower() in ("1", "true", "yes")
+    # parts held in memory between the download and the upload of a streamed file
+    STREAM_UPLOAD_BUFFER_PARTS = int(os.environ.get("STREAM_UPLOAD_BUFFER_PARTS", 8))
+    # parts of a streamed file uploaded at the same time
+    STREAM_UPLOAD_WORKERS = int(os.environ.get("STREAM_UPLOAD_WORKERS", 4))
+    # parallel MTProto sessions and part uploaders used to upload files from disk; 0 uses pyrogram's own upload
+    UPLOAD_SESSIONS = int(os.environ.get("UPLOAD_SESSIONS", 4))
+    UPLOAD_WORKERS = int(os.environ.get("UPLOAD_WORKERS", 8))
+    # extra bot tokens, separated by spaces, that only upload; they post into UPLOAD_CHANNEL for the main bot to copy
+    HELPER_BOT_TOKENS = os.environ.get("HELPER_BOT_TOKENS", "").split()
+    UPLOAD_CHANNEL = int(os.environ.get("UPLOAD_CHANNEL", 0))
+    # probes waiting for a format button, for how many seconds, and whether
+    # probes over the limit are written to disk instead of dropped
+    PROBE_STORE_SIZE = int(os.environ.get("PROBE_STORE_SIZE", 5000))
+    PROBE_STORE_TTL = int(os.environ.get("PROBE_STORE_TTL", 86400))
+    PROBE_STORE_SPILL = os.environ.get("PROBE_STORE_SPILL", "False").lower() in ("1", "true", "yes")
+    # worker processes that keep yt-dlp loaded for probes; downloads get MAX_CONCURRENT_DOWNLOADS of their own
+    YTDL_WORKERS = int(os.environ.get("YTDL_WORKERS", 2))
+    # yt-dlp probe results kept in memory, for how many seconds, and where else
+    # to keep them: "memory" only, "disk" or "mongo"
+    PROBE_CACHE_SIZE = int(os.environ.get("PROBE_CACHE_SIZE", 1000))
+    PROBE_CACHE_TTL = int(os.environ.get("PROBE_CACHE_TTL", 1800))
+    PROBE_CACHE_BACKEND = os.environ.get("PROBE_CACHE_BACKEND", "memory")
+    # jobs (url callbacks) allowed to run at once, in total and per user
+    MAX_CONCURRENT_JOBS = int(os.environ.get("MAX_CONCURRENT_JOBS", 8))
+    MAX_JOBS_PER_USER = int(os.environ.get("MAX_JOBS_PER_USER", 1))
+    # workers for each pipeline stage (download, postprocess, upload)
+    MAX_CONCURRENT_DOWNLOADS = int(os.environ.get("MAX_CONCURRENT_DOWNLOADS", 3))
+    MAX_CONCURRENT_TRANSCODES = int(os.environ.get("MAX_CONCURRENT_TRANSCODES", 2))
+    MAX_CONCURRENT_UPLOADS = int(os.environ.get("MAX_CONCURRENT_UPLOADS", 2))
+    # jobs allowed to wait between two pipeline stages
+    PIPELINE_QUEUE_SIZE = int(os.environ.get("PIPELINE_QUEUE_SIZE", 2))
     # set timeout for subprocess
     PROCESS_MAX_TIMEOUT = 3600
     # your telegram id
     OWNER_ID = int(os.environ.get("OWNER_ID", 0))
     SESSION_NAME = "UPLOADER-X-BOT"
+    # concurrent broadcast senders, messages per second across all of them,
+    # and how many log lines / removed users are written at once
+    BROADCAST_WORKERS = int(os.environ.get("BROADCAST_WORKERS", 20))
+    BROADCAST_RATE = float(os.environ.get("BROADCAST_RATE", 25))
+    BROADCAST_BATCH_SIZE = int(os.environ.get("BROADCAST_BATCH_SIZE", 500))
+    # seconds between broadcast checkpoints saved to the database
+    BROADCAST_CHECKPOINT_INTERVAL = int(os.environ.get("BROADCAST_CHECKPOINT_INTERVAL", 30))
+    # seconds new users are batched before they are written to the database
+    USER_FLUSH_INTERVAL = int(os.environ.get("USER_FLUSH_INTERVAL", 10))
+    # users whose settings are kept in memory, and for how many seconds
+    USER_SETTINGS_CACHE_SIZE = int(os.environ.get("USER_SETTINGS_CACHE_SIZE", 10000))
+    USER_SETTINGS_CACHE_TTL = int(os.environ.get("USER_SETTINGS_CACHE_TTL", 600))
+    # bytes of processed custom thumbnails kept on disk
+    THUMBNAIL_CACHE_SIZE = int(os.environ.get("THUMBNAIL_CACHE_SIZE", 52428800))
+    # worker processes that resize custom thumbnails
+    THUMBNAIL_WORKERS = int(os.environ.get("THUMBNAIL_WORKERS", 1))
+    # bytes always left free in DOWNLOAD_LOCATION, and reserved for jobs of unknown size
+    DISK_MIN_FREE = int(os.environ.get("DISK_MIN_FREE", 1073741824))
+    DISK_DEFAULT_RESERVATION = int(os.environ.get("DISK_DEFAULT_RESERVATION", 524288000))
+    # seconds a job waits for disk space before it is refused
+    DISK_RESERVE_TIMEOUT = int(os.environ.get("DISK_RESERVE_TIMEOUT", 600))
+    # janitor: seconds between sweeps, age of orphaned files and bytes per user directory
+    DISK_JANITOR_INTERVAL = int(os.environ.get("DISK_JANITOR_INTERVAL", 600))
+    DISK_STALE_AGE = int(os.environ.get("DISK_STALE_AGE", 21600))
+    DISK_USER_QUOTA = int(os.environ.get("DISK_USER_QUOTA", 8589934592))
     # database uri (mongodb)
     DATABASE_URL = os.environ.get("DATABASE_URL", "")
     MAX_RESULTS = "50"
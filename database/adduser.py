@@ -1,8 +1,7 @@
 from pyrogram import Client
-from database.access import clinton
+from database.user_registry import user_registry
 from pyrogram.types import Message
 
 
 async def AddUser(bot: Client, update: Message):
-    if not await clinton.is_user_exist(update.from_user.id):
-           await clinton.add_user(update.from_user.id)
\ No newline at end of file
+    await user_registry.add(update.from_user.id)
\ No newline at end of file
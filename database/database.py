@@ -1,6 +1,8 @@
 import datetime
+import json
 import motor.motor_asyncio
-from typing import Dict, Any, Optional
+from pymongo.errors import BulkWriteError
+from typing import Dict, Any, Optional, Tuple, List
 import logging
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -11,14 +13,39 @@ class Database:
         self._client = motor.motor_asyncio.AsyncIOMotorClient(uri)
         self.clinton = self._client[database_name]
         self.col = self.clinton.USERS
-        self._create_indexes()
+        self.probes = self.clinton.PROBES
+        self.broadcasts = self.clinton.BROADCASTS
+        self.broadcast_failures = self.clinton.BROADCAST_FAILURES
+        self.uploads = self.clinton.UPLOADS
 
-    async def _create_indexes(self):
-       try:
-           await self.col.create_index([("id", 1)], unique=True)
-           logging.info("Index on 'id' created.")
-       except Exception as e:
-           logging.error(f"Failed to create indexes: {e}")
+    async def ensure_indexes(self) -> Dict[str, List[str]]:
+       """Creates the indexes every collection needs and reports what exists.
+
+       Returns:
+           Dict[str, List[str]]: The index names of each collection.
+       """
+       indexes = [
+           (self.col, [("id", 1)], {"unique": True}),
+           (self.probes, [("key", 1)], {"unique": True}),
+           (self.probes, [("expires_at", 1)], {"expireAfterSeconds": 0}),
+           (self.broadcasts, [("status", 1), ("created_at", -1)], {}),
+           (self.broadcast_failures, [("broadcast_id", 1)], {}),
+           (self.uploads, [("key", 1)], {"unique": True}),
+       ]
+       for collection, keys, options in indexes:
+           try:
+               name = await collection.create_index(keys, **options)
+               logging.info(f"Index {collection.name}.{name} is ready.")
+           except Exception as e:
+               logging.error(f"Failed to create index {keys} on {collection.name}: {e}")
+       report = {}
+       for collection in {collection.name: collection for collection, _, _ in indexes}.values():
+           try:
+               report[collection.name] = list((await collection.index_information()).keys())
+           except Exception as e:
+               logging.error(f"Failed to read indexes of {collection.name}: {e}")
+               report[collection.name] = []
+       return report
 
     def new_user(self, id: int) -> Dict[str, Any]:
         """Creates a basic user dictionary."""
@@ -38,6 +65,28 @@ class Database:
        except Exception as e:
            logging.error(f"Failed to add user with id {id}: {e}")
 
+    async def add_users(self, ids: List[int]) -> List[int]:
+       """Adds several new users in one request, skipping existing ones.
+
+       Returns:
+           List[int]: The ids that could not be written and should be retried.
+       """
+       try:
+           await self.col.insert_many([self.new_user(id) for id in ids], ordered=False)
+           logging.info(f"{len(ids)} users added successfully.")
+           return []
+       except BulkWriteError as e:
+           errors = e.details.get('writeErrors', [])
+           failed = [ids[error['index']] for error in errors if error.get('code') != 11000]
+           duplicates = len(errors) - len(failed)
+           logging.info(f"{len(ids) - len(errors)} of {len(ids)} users added, {duplicates} already existed.")
+           if failed:
+               logging.error(f"Failed to add {len(failed)} users: {e}")
+           return failed
+       except Exception as e:
+           logging.error(f"Failed to add {len(ids)} users: {e}")
+           return list(ids)
+
     async def is_user_exist(self, id: int) -> bool:
         """Checks if a user exists with the given id."""
         try:
@@ -65,6 +114,15 @@ class Database:
            logging.error(f"Error getting all users: {e}")
            return None
     
+    async def get_users_after(self, last_id=None):
+      """Returns a cursor over users after the given _id, in _id order."""
+      try:
+        query = {'_id': {'$gt': last_id}} if last_id is not None else {}
+        return self.col.find(query, {'id': 1}).sort('_id', 1)
+      except Exception as e:
+        logging.error(f"Error getting users after {last_id}: {e}")
+        return None
+
     async def delete_user(self, user_id: int) -> None:
         """Deletes a user with the given id."""
         try:
@@ -77,10 +135,26 @@ class Database:
         except Exception as e:
           logging.error(f"Failed to delete user with id {user_id}: {e}")
 
-    async def set_thumbnail(self, id: int, thumbnail: str) -> None:
+    async def delete_users(self, user_ids: List[int]) -> None:
+        """Deletes every user with one of the given ids in one request."""
+        try:
+           result = await self.col.delete_many({'id': {'$in': user_ids}})
+           logging.info(f"Deleted {result.deleted_count} of {len(user_ids)} users.")
+        except Exception as e:
+          logging.error(f"Failed to delete {len(user_ids)} users: {e}")
+
+    async def set_thumbnail(self, id: int, thumbnail: str, unique_id: Optional[str] = None) -> None:
         """Sets the thumbnail for a user."""
         try:
-           await self.col.update_one({'id': id}, {'$set': {'thumbnail': thumbnail, 'updated_at': datetime.datetime.now()}})
+           # the user may still be waiting in the registry's next batch
+           await self.col.update_one(
+               {'id': id},
+               {
+                   '$set': {'thumbnail': thumbnail, 'thumbnail_unique_id': unique_id, 'updated_at': datetime.datetime.now()},
+                   '$setOnInsert': {'created_at': datetime.datetime.now()}
+               },
+               upsert=True
+           )
            logging.info(f"Thumbnail set for user with id {id}")
         except Exception as e:
            logging.error(f"Failed to set thumbnail for user with id {id}: {e}")
@@ -101,4 +175,102 @@ class Database:
            return user.get('thumbnail', None) if user else None
         except Exception as e:
            logging.error(f"Error getting thumbnail for user id {id}: {e}")
-           return None
\ No newline at end of file
+           return None
+
+    async def get_user_settings(self, id: int, fields: Tuple[str, ...]) -> Optional[Dict[str, Any]]:
+        """Retrieves only the given fields of a user's document."""
+        try:
+           return await self.col.find_one({'id': id}, {field: 1 for field in fields})
+        except Exception as e:
+           logging.error(f"Error getting settings for user id {id}: {e}")
+           return None
+
+    async def get_probe(self, key: str) -> Optional[Tuple[float, Dict[str, Any]]]:
+        """Retrieves a cached yt-dlp probe as (expires_at, data)."""
+        try:
+           probe = await self.probes.find_one({'key': key})
+           if probe is None:
+               return None
+           return probe['expires_at'].replace(tzinfo=datetime.timezone.utc).timestamp(), json.loads(probe['data'])
+        except Exception as e:
+           logging.error(f"Error getting probe {key}: {e}")
+           return None
+
+    async def set_probe(self, key: str, data: Dict[str, Any], expires_at: float) -> None:
+        """Caches a yt-dlp probe until expires_at."""
+        try:
+           await self.probes.update_one(
+               {'key': key},
+               {'$set': {'data': json.dumps(data, ensure_ascii=False), 'expires_at': datetime.datetime.utcfromtimestamp(expires_at)}},
+               upsert=True
+           )
+        except Exception as e:
+           logging.error(f"Failed to set probe {key}: {e}")
+
+    async def get_upload(self, key: str) -> Optional[str]:
+        """Retrieves the file_id of a cached upload."""
+        try:
+           upload = await self.uploads.find_one({'key': key})
+           return upload['file_id'] if upload else None
+        except Exception as e:
+           logging.error(f"Error getting upload {key}: {e}")
+           return None
+
+    async def set_upload(self, key: str, file_id: str) -> None:
+        """Caches the file_id Telegram returned for an upload."""
+        try:
+           await self.uploads.update_one(
+               {'key': key},
+               {'$set': {'file_id': file_id, 'created_at': datetime.datetime.now()}},
+               upsert=True
+           )
+        except Exception as e:
+           logging.error(f"Failed to set upload {key}: {e}")
+
+    async def delete_upload(self, key: str) -> None:
+        """Forgets a cached upload whose file_id stopped working."""
+        try:
+           await self.uploads.delete_one({'key': key})
+        except Exception as e:
+           logging.error(f"Failed to delete upload {key}: {e}")
+
+    async def create_broadcast(self, job: Dict[str, Any]) -> None:
+        """Stores a new broadcast job."""
+        try:
+           job['created_at'] = job['updated_at'] = datetime.datetime.now()
+           await self.broadcasts.insert_one(job)
+        except Exception as e:
+           logging.error(f"Failed to create broadcast {job.get('_id')}: {e}")
+
+    async def update_broadcast(self, broadcast_id: str, update_data: Dict[str, Any]) -> None:
+        """Updates the checkpoint, counters or status of a broadcast job."""
+        try:
+           update_data['updated_at'] = datetime.datetime.now()
+           await self.broadcasts.update_one({'_id': broadcast_id}, {'$set': update_data})
+        except Exception as e:
+           logging.error(f"Failed to update broadcast {broadcast_id}: {e}")
+
+    async def get_broadcast(self, broadcast_id: str) -> Optional[Dict[str, Any]]:
+        """Retrieves a broadcast job by id."""
+        try:
+           return await self.broadcasts.find_one({'_id': broadcast_id})
+        except Exception as e:
+           logging.error(f"Error getting broadcast {broadcast_id}: {e}")
+           return None
+
+    async def get_unfinished_broadcast(self) -> Optional[Dict[str, Any]]:
+        """Retrieves the most recent broadcast job that did not finish."""
+        try:
+           return await self.broadcasts.find_one({'status': 'running'}, sort=[('created_at', -1)])
+        except Exception as e:
+           logging.error(f"Error getting unfinished broadcast: {e}")
+           return None
+
+    async def log_broadcast_failures(self, broadcast_id: str, failures: List[Dict[str, Any]]) -> None:
+        """Stores a batch of failed sends of a broadcast."""
+        try:
+           for failure in failures:
+               failure['broadcast_id'] = broadcast_id
+           await self.broadcast_failures.insert_many(failures, ordered=False)
+        except Exception as e:
+           logging.error(f"Failed to log {len(failures)} failures of broadcast {broadcast_id}: {e}")
\ No newline at end of file
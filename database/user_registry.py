@@ -0,0 +1,127 @@
+import logging
+import asyncio
+import time
+from array import array
+from bisect import bisect_left
+from typing import Iterable, List, Optional, Set
+from config import Config
+from database.access import clinton
+
+logging.basicConfig(level=logging.DEBUG,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# seconds before loading the users is retried after a failure, doubled up to the maximum
+WARM_RETRY_MIN = 30
+WARM_RETRY_MAX = 1800
+
+
+class UserRegistry:
+    """Answers "is this user registered?" without a database round trip.
+
+    The ids in USERS are loaded once into a sorted array of 64-bit ints,
+    which takes 8 bytes per user. Users seen since then are kept in a set
+    and written to the database in batches every
+    Config.USER_FLUSH_INTERVAL seconds. A batch lost in a crash is
+    harmless: those users are simply registered again on their next
+    message. Users whose write fails are kept for the next batch, and the
+    last batch is written on shutdown.
+
+    If the ids cannot be loaded, users are checked one by one and the
+    load is retried with a growing backoff rather than on every message.
+    """
+
+    def __init__(self, flush_interval: int):
+        self.flush_interval = flush_interval
+        self._known: Optional[array] = None
+        self._added: Set[int] = set()
+        self._removed: Set[int] = set()
+        self._pending: Set[int] = set()
+        self._lock = asyncio.Lock()
+        self._flusher: Optional[asyncio.Task] = None
+        self._warm_after = 0.0
+        self._warm_backoff = 0
+
+    async def warm(self) -> None:
+        """Loads the ids of every registered user."""
+        async with self._lock:
+            if self._known is not None:
+                return
+            ids = []
+            async for user in clinton.col.find({}, {'id': 1, '_id': 0}):
+                if user.get('id') is not None:
+                    ids.append(int(user['id']))
+            ids.sort()
+            self._known = array('q', ids)
+            logger.info(f"Loaded {len(ids)} registered users")
+
+    def _contains(self, user_id: int) -> bool:
+        if user_id in self._added:
+            return True
+        if user_id in self._removed:
+            return False
+        index = bisect_left(self._known, user_id)
+        return index < len(self._known) and self._known[index] == user_id
+
+    async def add(self, user_id: int) -> None:
+        """Registers a user unless they are already known."""
+        if self._known is None and not await self._try_warm():
+            if not await clinton.is_user_exist(user_id):
+                await clinton.add_user(user_id)
+            return
+        if self._contains(user_id):
+            return
+        self._added.add(user_id)
+        self._removed.discard(user_id)
+        self._pending.add(user_id)
+        self._schedule_flush()
+
+    async def _try_warm(self) -> bool:
+        """Loads the ids unless a load is running or failed recently; tells whether they are loaded."""
+        if self._lock.locked() or time.monotonic() < self._warm_after:
+            return False
+        try:
+            await self.warm()
+        except Exception as e:
+            self._warm_backoff = min(WARM_RETRY_MAX, self._warm_backoff * 2 or WARM_RETRY_MIN)
+            self._warm_after = time.monotonic() + self._warm_backoff
+            logger.error(f"Failed to load registered users, retrying in {self._warm_backoff}s: {e}")
+            return False
+        self._warm_backoff = 0
+        return self._known is not None
+
+    def _schedule_flush(self) -> None:
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.create_task(self._flush_later())
+
+    def _retry(self, user_ids: List[int]) -> None:
+        """Puts users whose write failed back into the next batch."""
+        user_ids = [user_id for user_id in user_ids if user_id in self._added]
+        if user_ids:
+            self._pending.update(user_ids)
+            self._schedule_flush()
+
+    def forget(self, user_ids: Iterable[int]) -> None:
+        """Drops users that were deleted from the database."""
+        for user_id in user_ids:
+            self._added.discard(user_id)
+            self._pending.discard(user_id)
+            self._removed.add(user_id)
+
+    async def flush(self) -> None:
+        """Writes every waiting user in one request."""
+        if not self._pending:
+            return
+        user_ids: List[int] = list(self._pending)
+        self._pending.clear()
+        self._retry(await clinton.add_users(user_ids))
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(self.flush_interval)
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.error(f"Failed to flush new users: {e}")
+
+
+user_registry = UserRegistry(flush_interval=Config.USER_FLUSH_INTERVAL)
\ No newline at end of file
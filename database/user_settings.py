@@ -0,0 +1,80 @@
+import logging
+import time
+from collections import OrderedDict
+from typing import Optional, Dict, Any, Tuple
+from config import Config
+from database.access import clinton
+
+logging.basicConfig(level=logging.DEBUG,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# the fields of a user document that make up their settings
+SETTINGS_FIELDS = ("thumbnail", "thumbnail_unique_id", "upload_as", "caption")
+
+
+class UserSettings:
+    """The preferences of one user, read from their USERS document.
+
+    Attributes:
+        user_id (int): The Telegram id of the user.
+        thumbnail (str): The file id of the custom thumbnail, if any.
+        thumbnail_unique_id (str): The file unique id of that thumbnail.
+        upload_as (str): The preferred upload type, if any.
+        caption (str): The custom caption template, if any.
+    """
+
+    def __init__(self, user_id: int, document: Optional[Dict[str, Any]] = None):
+        document = document or {}
+        self.user_id = user_id
+        self.thumbnail: Optional[str] = document.get("thumbnail")
+        self.thumbnail_unique_id: Optional[str] = document.get("thumbnail_unique_id")
+        self.upload_as: Optional[str] = document.get("upload_as")
+        self.caption: Optional[str] = document.get("caption")
+
+
+class UserSettingsCache:
+    """Keeps recently used UserSettings so a job reads Mongo at most once.
+
+    Entries expire after a TTL and the least recently used ones are
+    dropped beyond the size bound. Writes go through ``set_thumbnail`` and
+    ``update`` so the cached entry is invalidated with them.
+    """
+
+    def __init__(self, max_entries: int, ttl: int):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[int, Tuple[float, UserSettings]]" = OrderedDict()
+
+    async def get(self, user_id: int) -> UserSettings:
+        """Returns the settings of a user, loading them if needed."""
+        entry = self._entries.get(user_id)
+        if entry is not None and entry[0] > time.time():
+            self._entries.move_to_end(user_id)
+            return entry[1]
+        settings = UserSettings(user_id, await clinton.get_user_settings(user_id, SETTINGS_FIELDS))
+        self._entries[user_id] = (time.time() + self.ttl, settings)
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return settings
+
+    def invalidate(self, user_id: int) -> None:
+        """Forgets the cached settings of a user."""
+        self._entries.pop(user_id, None)
+
+    async def set_thumbnail(self, user_id: int, thumbnail: Optional[str], unique_id: Optional[str] = None) -> None:
+        """Saves the thumbnail of a user."""
+        await clinton.set_thumbnail(user_id, thumbnail=thumbnail, unique_id=unique_id)
+        self.invalidate(user_id)
+
+    async def update(self, user_id: int, update_data: Dict[str, Any]) -> None:
+        """Saves other preferences of a user."""
+        await clinton.update_user(user_id, update_data)
+        self.invalidate(user_id)
+
+
+user_settings = UserSettingsCache(
+    max_entries=Config.USER_SETTINGS_CACHE_SIZE,
+    ttl=Config.USER_SETTINGS_CACHE_TTL
+)
\ No newline at end of file
@@ -0,0 +1,139 @@
+import logging
+import itertools
+import os
+from contextlib import asynccontextmanager
+from typing import Optional, Dict, List, Callable, Awaitable
+from pyrogram import Client
+from pyrogram.types import Message
+from config import Config
+from helper_funcs.part_upload import send_uploaded_media
+from helper_funcs.upload_engine import upload_engine
+
+logging.basicConfig(level=logging.DEBUG,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+ProgressCallback = Callable[[int, int], Awaitable[None]]
+
+
+class ClientPool:
+    """Spreads uploads over extra helper bots.
+
+    Every token in Config.HELPER_BOT_TOKENS runs a client that only
+    uploads. Each upload goes to the helper with the fewest uploads in
+    progress. The helper posts the file in Config.UPLOAD_CHANNEL, where
+    both the helpers and the main bot must be admins, and the main bot
+    copies it into the user's chat. This way each account's flood limits
+    and DC connections carry only part of the load. Without helpers, the
+    main bot uploads everything itself.
+    """
+
+    def __init__(self, tokens: List[str], channel: int):
+        self.tokens = tokens
+        self.channel = channel
+        self._clients: List[Client] = []
+        self._load: Dict[int, int] = {}
+        self._turn = itertools.count()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self._clients) and bool(self.channel)
+
+    async def start(self) -> None:
+        """Starts a client for every helper token."""
+        if self.tokens and not self.channel:
+            logger.warning("HELPER_BOT_TOKENS is set without UPLOAD_CHANNEL, helpers are not used")
+            return
+        for index, token in enumerate(self.tokens):
+            client = Client(
+                ":memory:",
+                bot_token=token,
+                api_id=Config.API_ID,
+                api_hash=Config.API_HASH
+            )
+            try:
+                await client.start()
+            except Exception as e:
+                logger.error(f"Failed to start helper bot {index}: {e}")
+                continue
+            self._clients.append(client)
+            self._load[id(client)] = 0
+        if self._clients:
+            logger.info(f"Started {len(self._clients)} helper bots for uploads")
+
+    async def stop(self) -> None:
+        for client in self._clients:
+            try:
+                await client.stop()
+            except Exception as e:
+                logger.error(f"Failed to stop helper bot: {e}")
+
+    @asynccontextmanager
+    async def uploader(self, bot):
+        """Lends the least loaded helper, or the main bot if there are none."""
+        if not self.enabled:
+            yield bot
+            return
+        turn = next(self._turn)
+        # ties are broken round-robin so idle helpers take turns
+        client = min(
+            self._clients,
+            key=lambda c: (self._load[id(c)], (self._clients.index(c) - turn) % len(self._clients))
+        )
+        self._load[id(client)] += 1
+        try:
+            yield client
+        finally:
+            self._load[id(client)] -= 1
+
+    async def send_file(
+        self,
+        bot,
+        chat_id: int,
+        path: str,
+        tg_send_type: str,
+        caption: str = "",
+        parse_mode: Optional[str] = None,
+        duration: int = 0,
+        width: int = 0,
+        height: int = 0,
+        thumb: Optional[str] = None,
+        reply_to_message_id: Optional[int] = None,
+        progress: Optional[ProgressCallback] = None
+    ) -> Optional[Message]:
+        """Uploads a file with the least loaded client and sends it as the main bot.
+
+        Returns:
+            Optional[Message]: The message the user received.
+        """
+        async with self.uploader(bot) as client:
+            file = await upload_engine.upload(client, path, progress=progress)
+            target = chat_id if client is bot else self.channel
+            sent = await send_uploaded_media(
+                client,
+                target,
+                file,
+                tg_send_type,
+                os.path.basename(path),
+                caption=caption,
+                parse_mode=parse_mode,
+                duration=duration,
+                width=width,
+                height=height,
+                thumb=thumb,
+                reply_to_message_id=reply_to_message_id if client is bot else None
+            )
+        if client is bot or sent is None:
+            return sent
+        return await bot.copy_message(
+            chat_id=chat_id,
+            from_chat_id=self.channel,
+            message_id=sent.message_id,
+            reply_to_message_id=reply_to_message_id
+        )
+
+
+client_pool = ClientPool(
+    tokens=Config.HELPER_BOT_TOKENS,
+    channel=Config.UPLOAD_CHANNEL
+)
\ No newline at end of file
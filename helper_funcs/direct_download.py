@@ -0,0 +1,467 @@
+import logging
+import asyncio
+import json
+import os
+import time
+from typing import Optional, List, Tuple, Callable, Awaitable, Dict, Any, AsyncIterator
+import aiohttp
+from config import Config
+
+logging.basicConfig(level=logging.DEBUG,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+ProgressCallback = Callable[[int, int], Awaitable[None]]
+
+JOURNAL_SUFFIX = ".journal"
+# seconds between journal checkpoints while a download is running
+JOURNAL_SAVE_INTERVAL = 2
+
+
+async def probe_url(session: aiohttp.ClientSession, url: str) -> Dict[str, Any]:
+    """Probes a direct link for its size and range support.
+
+    A HEAD request is tried first. Servers that reject HEAD or do not
+    report a size are asked for the first byte with a Range GET instead.
+
+    Args:
+        session (aiohttp.ClientSession): The session used for the request.
+        url (str): The URL of the file.
+
+    Returns:
+        Dict[str, Any]: total_length, content_type, accept_ranges, etag,
+            last_modified and the final url after redirects.
+    """
+    info = {
+        "total_length": 0,
+        "content_type": "",
+        "accept_ranges": False,
+        "etag": None,
+        "last_modified": None,
+        "url": url
+    }
+    try:
+        async with session.head(url, allow_redirects=True, timeout=Config.DDL_PROBE_TIMEOUT) as response:
+            if response.status < 400:
+                info["total_length"] = int(response.headers.get("Content-Length", 0))
+                info["content_type"] = response.headers.get("Content-Type", "")
+                info["accept_ranges"] = response.headers.get("Accept-Ranges", "").lower() == "bytes"
+                info["etag"] = response.headers.get("ETag")
+                info["last_modified"] = response.headers.get("Last-Modified")
+                info["url"] = str(response.url)
+    except Exception as e:
+        logger.debug(f"HEAD request failed for {url}: {e}")
+
+    if info["total_length"] and info["accept_ranges"]:
+        return info
+
+    try:
+        async with session.get(url, headers={"Range": "bytes=0-0"}, timeout=Config.DDL_PROBE_TIMEOUT) as response:
+            info["content_type"] = response.headers.get("Content-Type", info["content_type"])
+            info["etag"] = response.headers.get("ETag", info["etag"])
+            info["last_modified"] = response.headers.get("Last-Modified", info["last_modified"])
+            info["url"] = str(response.url)
+            content_range = response.headers.get("Content-Range", "")
+            if response.status == 206 and "/" in content_range:
+                total = content_range.rsplit("/", 1)[1]
+                if total.isdigit():
+                    info["total_length"] = int(total)
+                    info["accept_ranges"] = True
+            elif response.status < 400 and not info["total_length"]:
+                info["total_length"] = int(response.headers.get("Content-Length", 0))
+    except Exception as e:
+        logger.debug(f"Range probe failed for {url}: {e}")
+
+    return info
+
+
+def split_ranges(total_length: int, connections: int, min_segment_size: int) -> List[Tuple[int, int]]:
+    """Splits a file into inclusive byte ranges, one per connection.
+
+    Args:
+        total_length (int): The size of the file in bytes.
+        connections (int): The maximum number of ranges.
+        min_segment_size (int): Ranges are never made smaller than this.
+
+    Returns:
+        List[Tuple[int, int]]: (start, end) pairs covering the whole file.
+    """
+    if total_length <= 0:
+        return []
+    parts = max(1, min(connections, total_length // max(1, min_segment_size)))
+    segment_size = total_length // parts
+    ranges = []
+    for i in range(parts):
+        start = i * segment_size
+        end = total_length - 1 if i == parts - 1 else start + segment_size - 1
+        ranges.append((start, end))
+    return ranges
+
+
+def journal_path(file_name: str) -> str:
+    """Returns the path of the range journal kept next to a partial file."""
+    return file_name + JOURNAL_SUFFIX
+
+
+def load_journal(file_name: str) -> Optional[Dict[str, Any]]:
+    """Loads the range journal of a partial download, if there is one.
+
+    Args:
+        file_name (str): The local path of the partial file.
+
+    Returns:
+        Optional[Dict[str, Any]]: The journal, or None if it is missing or unreadable.
+    """
+    path = journal_path(file_name)
+    if not os.path.exists(path) or not os.path.exists(file_name):
+        return None
+    try:
+        with open(path, "r", encoding="utf8") as f:
+            return json.load(f)
+    except Exception as e:
+        logger.error(f"Failed to read journal {path}: {e}")
+        return None
+
+
+def save_journal(file_name: str, journal: Dict[str, Any]) -> None:
+    """Atomically writes the range journal of a partial download."""
+    path = journal_path(file_name)
+    tmp_path = path + ".tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf8") as f:
+            json.dump(journal, f)
+        os.replace(tmp_path, path)
+    except Exception as e:
+        logger.error(f"Failed to write journal {path}: {e}")
+
+
+def remove_journal(file_name: str) -> None:
+    """Removes the range journal of a download, if there is one."""
+    try:
+        os.remove(journal_path(file_name))
+    except FileNotFoundError:
+        pass
+
+
+def _journal_matches(journal: Dict[str, Any], url: str, info: Dict[str, Any]) -> bool:
+    """Checks that a journal was written for the same, unchanged remote file."""
+    if journal.get("url") != url or journal.get("total_length") != info["total_length"]:
+        return False
+    if journal.get("etag") and info["etag"]:
+        return journal["etag"] == info["etag"]
+    if journal.get("last_modified") and info["last_modified"]:
+        return journal["last_modified"] == info["last_modified"]
+    # without validators there is no way to tell if the file changed
+    return False
+
+
+class _RangesIgnored(Exception):
+    """Raised when a server answers a Range request with the whole file."""
+
+
+class _Counter:
+    """Shared byte counter for every segment of one download."""
+
+    def __init__(self, total: int, progress: Optional[ProgressCallback]):
+        self.total = total
+        self.current = 0
+        self.progress = progress
+
+    async def add(self, size: int) -> None:
+        self.current += size
+        if self.progress is not None:
+            try:
+                await self.progress(self.current, self.total)
+            except Exception as e:
+                logger.error(f"Progress callback failed: {e}")
+
+
+class _ReadSizer:
+    """Picks read sizes from the measured throughput of a stream.
+
+    Reads are sized to roughly READ_TARGET_SECONDS worth of data, between
+    Config.CHUNK_SIZE and Config.DDL_MAX_CHUNK_SIZE, so slow links do not
+    sit on huge buffers and fast links are not drained in tiny pieces.
+    """
+
+    READ_TARGET_SECONDS = 0.1
+
+    def __init__(self):
+        self.size = Config.CHUNK_SIZE
+        self.rate = 0.0
+        self.last = time.monotonic()
+
+    def update(self, received: int) -> int:
+        now = time.monotonic()
+        elapsed = now - self.last
+        self.last = now
+        if elapsed > 0:
+            sample = received / elapsed
+            self.rate = sample if not self.rate else 0.8 * self.rate + 0.2 * sample
+            self.size = int(min(
+                Config.DDL_MAX_CHUNK_SIZE,
+                max(Config.CHUNK_SIZE, self.rate * self.READ_TARGET_SECONDS)
+            ))
+        return self.size
+
+
+class _BufferedWriter:
+    """Coalesces small chunks and writes them at an offset off the event loop."""
+
+    def __init__(self, fd: int, offset: int, on_flush: Optional[Callable[[int], None]] = None):
+        self.fd = fd
+        self.offset = offset
+        self.on_flush = on_flush
+        self.buffer = bytearray()
+
+    async def write(self, chunk: bytes) -> None:
+        self.buffer += chunk
+        if len(self.buffer) >= Config.DDL_WRITE_BUFFER_SIZE:
+            await self.flush()
+
+    async def flush(self) -> None:
+        if not self.buffer:
+            return
+        data = bytes(self.buffer)
+        self.buffer.clear()
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, _pwrite_all, self.fd, data, self.offset)
+        self.offset += len(data)
+        if self.on_flush is not None:
+            self.on_flush(self.offset)
+
+
+def _pwrite_all(fd: int, data: bytes, offset: int) -> None:
+    """Writes all of data at offset, retrying on short writes."""
+    view = memoryview(data)
+    while view:
+        written = os.pwrite(fd, view, offset)
+        view = view[written:]
+        offset += written
+
+
+async def _stream_into(response: aiohttp.ClientResponse, writer: _BufferedWriter, counter: _Counter) -> None:
+    """Copies a response body into a writer with adaptive read sizes."""
+    sizer = _ReadSizer()
+    read_size = sizer.size
+    try:
+        while True:
+            chunk = await response.content.read(read_size)
+            if not chunk:
+                break
+            await writer.write(chunk)
+            await counter.add(len(chunk))
+            read_size = sizer.update(len(chunk))
+    finally:
+        await writer.flush()
+
+
+async def _fetch_segment(
+    session: aiohttp.ClientSession,
+    url: str,
+    fd: int,
+    segment: List[int],
+    validator: Optional[str],
+    counter: _Counter
+) -> None:
+    """Fetches what is left of one byte range and writes it at its offset.
+
+    ``segment`` is a journal entry of [start, end, next_offset]; its last
+    item is advanced as bytes are written so the journal can be saved at
+    any time.
+    """
+    start, end, offset = segment
+    if offset > end:
+        return
+    headers = {"Range": f"bytes={offset}-{end}"}
+    if validator:
+        headers["If-Range"] = validator
+    async with session.get(url, headers=headers, timeout=Config.PROCESS_MAX_TIMEOUT) as response:
+        if response.status == 200:
+            raise _RangesIgnored(f"Range {offset}-{end} was answered with the whole file")
+        if response.status != 206:
+            raise aiohttp.ClientResponseError(
+                response.request_info,
+                response.history,
+                status=response.status,
+                message=f"Expected 206 for range {offset}-{end}"
+            )
+
+        def on_flush(flushed_to):
+            segment[2] = flushed_to
+
+        writer = _BufferedWriter(fd, offset, on_flush)
+        await _stream_into(response, writer, counter)
+        offset = writer.offset
+        if offset != end + 1:
+            raise aiohttp.ClientPayloadError(
+                f"Segment {start}-{end} ended early at {offset}"
+            )
+
+
+async def _fetch_single(
+    session: aiohttp.ClientSession,
+    url: str,
+    file_name: str,
+    counter: _Counter
+) -> None:
+    """Fetches the whole file over one stream."""
+    async with session.get(url, timeout=Config.PROCESS_MAX_TIMEOUT) as response:
+        response.raise_for_status()
+        fd = os.open(file_name, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            await _stream_into(response, _BufferedWriter(fd, 0), counter)
+        finally:
+            os.close(fd)
+
+
+async def stream_parts(session: aiohttp.ClientSession, url: str, part_size: int) -> AsyncIterator[bytes]:
+    """Yields the body of a direct link in pieces of exactly part_size bytes.
+
+    Only the last piece may be shorter. Nothing is written to disk; at most
+    one part plus one read is held in memory.
+
+    Args:
+        session (aiohttp.ClientSession): The session used for the request.
+        url (str): The URL of the file.
+        part_size (int): The size of every yielded piece but the last.
+    """
+    async with session.get(url, timeout=Config.PROCESS_MAX_TIMEOUT) as response:
+        response.raise_for_status()
+        sizer = _ReadSizer()
+        read_size = sizer.size
+        buffer = bytearray()
+        while True:
+            chunk = await response.content.read(read_size)
+            if not chunk:
+                break
+            buffer += chunk
+            read_size = sizer.update(len(chunk))
+            while len(buffer) >= part_size:
+                yield bytes(buffer[:part_size])
+                del buffer[:part_size]
+        if buffer:
+            yield bytes(buffer)
+
+
+async def _checkpoint(file_name: str, journal: Dict[str, Any]) -> None:
+    """Saves the journal every JOURNAL_SAVE_INTERVAL seconds until cancelled.
+
+    A save already running when the task is cancelled is finished first,
+    so once the task is done nothing else writes the journal.
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(JOURNAL_SAVE_INTERVAL)
+        save = loop.run_in_executor(None, save_journal, file_name, json.loads(json.dumps(journal)))
+        try:
+            await asyncio.shield(save)
+        except asyncio.CancelledError:
+            await save
+            raise
+
+
+async def download_file(
+    session: aiohttp.ClientSession,
+    url: str,
+    file_name: str,
+    progress: Optional[ProgressCallback] = None,
+    connections: int = Config.DDL_CONNECTIONS,
+    info: Optional[Dict[str, Any]] = None
+) -> bool:
+    """Downloads a direct link, over several connections when possible.
+
+    The server is probed first, unless the result of ``probe_url`` is
+    passed in. If it reports a size and honours Range requests, the file
+    is preallocated and split into byte ranges that are fetched
+    concurrently and written with positional writes. Otherwise, or if the
+    server turns out to ignore the ranges it advertised, the file is
+    fetched over a single stream.
+
+    Ranged downloads keep a journal next to the file with the URL, the
+    ETag/Last-Modified validators and how far each range got. If a journal
+    for the same unchanged file is found, only the missing bytes are
+    fetched. The journal is removed once the download completes and left in
+    place if it fails, so a later attempt can resume.
+
+    Args:
+        session (aiohttp.ClientSession): The session used for all requests.
+        url (str): The URL of the file to download.
+        file_name (str): The local path to save the file to.
+        progress (ProgressCallback): Awaited with (current, total) as bytes arrive.
+        connections (int): The maximum number of concurrent connections.
+        info (Dict[str, Any]): The result of probe_url for this url, if already known.
+
+    Returns:
+        bool: True if the file was downloaded, False otherwise.
+    """
+    if info is None:
+        info = await probe_url(session, url)
+    total_length = info["total_length"]
+    if "text" in info["content_type"] and total_length < 500:
+        logger.info(f"URL {url} returned a small text response, not a file")
+        return False
+
+    if not (info["accept_ranges"] and total_length):
+        logger.debug(f"Downloading {url} over a single connection")
+        remove_journal(file_name)
+        await _fetch_single(session, info["url"], file_name, _Counter(total_length, progress))
+        return True
+
+    journal = load_journal(file_name)
+    if journal is not None and _journal_matches(journal, url, info):
+        logger.info(f"Resuming {url} from journal")
+        fd = os.open(file_name, os.O_RDWR)
+    else:
+        journal = {
+            "url": url,
+            "etag": info["etag"],
+            "last_modified": info["last_modified"],
+            "total_length": total_length,
+            "segments": [
+                [start, end, start]
+                for start, end in split_ranges(total_length, max(1, connections), Config.DDL_MIN_SEGMENT_SIZE)
+            ]
+        }
+        fd = os.open(file_name, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            os.posix_fallocate(fd, 0, total_length)
+        except (AttributeError, OSError):
+            os.ftruncate(fd, total_length)
+    save_journal(file_name, journal)
+
+    segments = journal["segments"]
+    counter = _Counter(total_length, progress)
+    counter.current = sum(offset - start for start, _, offset in segments)
+    validator = info["etag"] if info["etag"] and not info["etag"].startswith("W/") else info["last_modified"]
+    logger.debug(f"Downloading {url} in {len(segments)} segments")
+    start_time = time.time()
+    ranges_ignored = False
+    checkpoint = asyncio.create_task(_checkpoint(file_name, journal))
+    try:
+        tasks = [
+            asyncio.create_task(_fetch_segment(session, info["url"], fd, segment, validator, counter))
+            for segment in segments
+        ]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException as e:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            if not isinstance(e, _RangesIgnored):
+                raise
+            ranges_ignored = True
+    finally:
+        checkpoint.cancel()
+        # the final save must not race a checkpoint still writing the .tmp file
+        await asyncio.gather(checkpoint, return_exceptions=True)
+        os.close(fd)
+        save_journal(file_name, journal)
+    remove_journal(file_name)
+    if ranges_ignored:
+        logger.warning(f"{url} advertised range support but ignored it, using a single connection")
+        await _fetch_single(session, info["url"], file_name, _Counter(total_length, progress))
+        return True
+    logger.info(f"Downloaded {url} in {time.time() - start_time:.2f}s over {len(segments)} connections")
+    return True
\ No newline at end of file
@@ -0,0 +1,254 @@
+import logging
+import asyncio
+import json
+import os
+import re
+import shutil
+import time
+from typing import Optional, Set, List, Tuple
+from config import Config
+
+logging.basicConfig(level=logging.DEBUG,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+class Reservation:
+    """Disk space held by one job, and the temporary files it owns."""
+
+    def __init__(self, manager: "DiskManager", owner: int, size: int):
+        self.manager = manager
+        self.owner = owner
+        self.size = size
+        self.paths: Set[str] = set()
+        self.released = False
+
+    def track(self, path: Optional[str]) -> None:
+        """Marks a file or directory as belonging to this job."""
+        if path:
+            self.paths.add(os.path.abspath(path))
+
+    def disown(self, path: Optional[str]) -> None:
+        """Keeps a file after the job, e.g. a partial download that can resume."""
+        if path:
+            self.paths.discard(os.path.abspath(path))
+
+    async def release(self) -> None:
+        """Deletes the files the job still owns and frees its space."""
+        if self.released:
+            return
+        self.released = True
+        paths = list(self.paths)
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, _remove_owned, paths)
+        self.manager._release(self)
+
+
+# files tools write next to a tracked path, e.g. video.mp4.part or video.mp4.journal
+DERIVED_SUFFIXES = (".part", ".ytdl", ".journal", ".journal.tmp")
+# yt-dlp format parts and merge output of video.mp4, e.g. video.f137.mp4.part or video.temp.mkv
+FRAGMENT_PATTERN = re.compile(r"^(?P<stem>.+)\.(?:f[\w-]+|temp)\.\w+(?:\.part|\.ytdl)?$")
+
+
+def _is_owned(path: str, owned: Set[str]) -> bool:
+    """Tells whether a path is tracked, lies in a tracked directory, or derives from a tracked file."""
+    if path in owned:
+        return True
+    for suffix in DERIVED_SUFFIXES:
+        if path.endswith(suffix) and path[:-len(suffix)] in owned:
+            return True
+    match = FRAGMENT_PATTERN.match(path)
+    for owned_path in owned:
+        if path.startswith(owned_path + os.sep):
+            return True
+        if match is not None and os.path.splitext(owned_path)[0] == match["stem"]:
+            return True
+    return False
+
+
+def _remove_owned(paths: List[str]) -> None:
+    """Removes the paths and the files tools derived from them."""
+    owned = set(paths)
+    derived = []
+    for directory in {os.path.dirname(path) for path in paths}:
+        try:
+            names = os.listdir(directory)
+        except FileNotFoundError:
+            continue
+        for name in names:
+            path = os.path.join(directory, name)
+            if path not in owned and _is_owned(path, owned):
+                derived.append(path)
+    _remove_paths(paths + derived)
+
+
+def _remove_expired(directory: str, now: float) -> int:
+    """Removes cache entries whose ``expires_at`` has passed; returns the bytes freed."""
+    freed = 0
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        if not name.endswith(".json") or not os.path.isfile(path):
+            continue
+        try:
+            with open(path, "r", encoding="utf8") as f:
+                expired = json.load(f)["expires_at"] < now
+        except Exception:
+            # unreadable entries are dropped once nothing can still be writing them
+            expired = now - os.path.getmtime(path) > Config.DISK_STALE_AGE
+        if expired:
+            freed += os.path.getsize(path)
+            _remove_paths([path])
+    return freed
+
+
+def _remove_paths(paths: List[str]) -> None:
+    for path in paths:
+        try:
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            elif os.path.lexists(path):
+                os.remove(path)
+        except Exception as e:
+            logger.error(f"Failed to remove {path}: {e}")
+
+
+class DiskManager:
+    """Keeps DOWNLOAD_LOCATION from filling up.
+
+    Jobs reserve the space they expect to need before they download.
+    When the free space, less Config.DISK_MIN_FREE and what other jobs
+    hold, cannot cover a reservation, the job waits for up to
+    Config.DISK_RESERVE_TIMEOUT seconds and is then refused.
+
+    A background janitor removes files that no running job owns once they
+    are older than Config.DISK_STALE_AGE. It also trims each user's
+    directory to Config.DISK_USER_QUOTA, oldest files first, and drops
+    expired entries from the probe caches under DOWNLOAD_LOCATION.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._reserved = 0
+        self._reservations: Set[Reservation] = set()
+        self._changed: Optional[asyncio.Condition] = None
+        self._janitor: Optional[asyncio.Task] = None
+
+    @property
+    def reserved(self) -> int:
+        return self._reserved
+
+    def _available(self) -> Tuple[int, int]:
+        usage = shutil.disk_usage(self.directory)
+        return usage.free - self._reserved - Config.DISK_MIN_FREE, usage.total - Config.DISK_MIN_FREE
+
+    async def reserve(self, owner: int, size: Optional[int]) -> Optional[Reservation]:
+        """Reserves space for a job, waiting for other jobs if needed.
+
+        Args:
+            owner (int): The user the job belongs to.
+            size (int): The expected size in bytes; Config.DISK_DEFAULT_RESERVATION if None.
+
+        Returns:
+            Optional[Reservation]: The reservation, or None if the space cannot be had.
+        """
+        if size is None:
+            size = Config.DISK_DEFAULT_RESERVATION
+        if self._changed is None:
+            self._changed = asyncio.Condition()
+        os.makedirs(self.directory, exist_ok=True)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + Config.DISK_RESERVE_TIMEOUT
+        async with self._changed:
+            while True:
+                available, capacity = await loop.run_in_executor(None, self._available)
+                if size > capacity:
+                    logger.warning(f"Refusing {size} bytes for {owner}, the disk is too small")
+                    return None
+                if size <= available:
+                    break
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    logger.warning(f"Refusing {size} bytes for {owner}, only {available} available")
+                    return None
+                try:
+                    await asyncio.wait_for(self._changed.wait(), timeout=min(remaining, 30))
+                except asyncio.TimeoutError:
+                    pass
+            reservation = Reservation(self, owner, size)
+            self._reservations.add(reservation)
+            self._reserved += size
+        logger.debug(f"Reserved {size} bytes for {owner}, {self._reserved} reserved in total")
+        return reservation
+
+    def _release(self, reservation: Reservation) -> None:
+        if reservation in self._reservations:
+            self._reservations.discard(reservation)
+            self._reserved -= reservation.size
+        asyncio.create_task(self._notify())
+
+    async def _notify(self) -> None:
+        if self._changed is None:
+            return
+        async with self._changed:
+            self._changed.notify_all()
+
+    def start_janitor(self) -> None:
+        """Starts sweeping stale files in the background."""
+        if self._janitor is None or self._janitor.done():
+            self._janitor = asyncio.create_task(self._run_janitor())
+
+    async def _run_janitor(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                owned = set()
+                for reservation in self._reservations:
+                    owned.update(reservation.paths)
+                freed = await loop.run_in_executor(None, self.sweep, owned)
+                if freed:
+                    logger.info(f"Janitor freed {freed} bytes in {self.directory}")
+                    await self._notify()
+            except Exception as e:
+                logger.error(f"Janitor failed: {e}")
+            await asyncio.sleep(Config.DISK_JANITOR_INTERVAL)
+
+    def sweep(self, owned: Set[str]) -> int:
+        """Removes stale and over-quota files; returns the bytes freed."""
+        if not os.path.isdir(self.directory):
+            return 0
+        now = time.time()
+        freed = 0
+        for name in os.listdir(self.directory):
+            path = os.path.abspath(os.path.join(self.directory, name))
+            # caches bound their own size, the janitor only drops expired entries
+            if name.startswith("."):
+                if os.path.isdir(path):
+                    freed += _remove_expired(path, now)
+                continue
+            if not os.path.isdir(path):
+                if not _is_owned(path, owned) and now - os.path.getmtime(path) > Config.DISK_STALE_AGE:
+                    freed += os.path.getsize(path)
+                    _remove_paths([path])
+                continue
+            files = []
+            for root, _, names in os.walk(path):
+                for file_name in names:
+                    file_path = os.path.join(root, file_name)
+                    if _is_owned(file_path, owned):
+                        continue
+                    try:
+                        stat = os.stat(file_path)
+                    except FileNotFoundError:
+                        continue
+                    files.append((stat.st_mtime, stat.st_size, file_path))
+            used = sum(size for _, size, _ in files)
+            for mtime, size, file_path in sorted(files):
+                if now - mtime <= Config.DISK_STALE_AGE and used <= Config.DISK_USER_QUOTA:
+                    continue
+                _remove_paths([file_path])
+                used -= size
+                freed += size
+        return freed
+
+
+disk_manager = DiskManager(directory=Config.DOWNLOAD_LOCATION)
\ No newline at end of file
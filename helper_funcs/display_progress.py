@@ -2,7 +2,8 @@ import logging
 import math
 import time
 import asyncio
-from typing import Optional
+from typing import Optional, Dict, Tuple, Any, Set
+from pyrogram.errors import FloodWait
 from config import Config
 # the Strings used for this "thing"
 from translation import Translation
@@ -13,6 +14,139 @@ logging.basicConfig(level=logging.DEBUG,
 logger = logging.getLogger(__name__)
 
 
+class ProgressService:
+    """Batches progress edits for every transfer into one edit loop.
+
+    Transfers publish their latest status text per message; nothing is sent
+    at that point. Every ``interval`` seconds the service edits each message
+    whose text changed since its last edit. A FloodWait on any edit pauses
+    all progress edits for the requested time, so progress never competes
+    with real uploads for the API rate limit.
+
+    A message can follow another one; it then gets every progress text
+    published for the message it follows.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._pending: Dict[Tuple[int, int], Tuple[Any, str]] = {}
+        self._last_sent: Dict[Tuple[int, int], str] = {}
+        self._followers: Dict[Tuple[int, int], Set[Tuple[int, int]]] = {}
+        self._flood_until = 0.0
+        self._task: Optional[asyncio.Task] = None
+        # the message whose edit is awaited right now, and whether it was cleared meanwhile
+        self._sending: Optional[Tuple[int, int]] = None
+        self._sending_cleared = False
+
+    def publish(self, bot, chat_id: int, message_id: int, text: str) -> None:
+        """Queues the latest progress text of a message for the next flush."""
+        key = (chat_id, message_id)
+        self._queue(bot, key, text)
+        for follower in self._followers.get(key, ()):
+            self._queue(bot, follower, text)
+        if self._pending and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._run())
+
+    def _queue(self, bot, key: Tuple[int, int], text: str) -> None:
+        if self._last_sent.get(key) == text:
+            self._pending.pop(key, None)
+            return
+        self._pending[key] = (bot, text)
+
+    def follow(self, chat_id: int, message_id: int, follower_chat_id: int, follower_message_id: int) -> None:
+        """Mirrors the progress of one message into another."""
+        self._followers.setdefault((chat_id, message_id), set()).add((follower_chat_id, follower_message_id))
+
+    def unfollow(self, chat_id: int, message_id: int, follower_chat_id: int, follower_message_id: int) -> None:
+        """Stops mirroring progress and drops what is still queued for the follower."""
+        followers = self._followers.get((chat_id, message_id))
+        if followers is not None:
+            followers.discard((follower_chat_id, follower_message_id))
+            if not followers:
+                del self._followers[(chat_id, message_id)]
+        self.clear(follower_chat_id, follower_message_id)
+
+    def clear(self, chat_id: int, message_id: int) -> None:
+        """Drops queued progress of a message before it gets its final text."""
+        self._pending.pop((chat_id, message_id), None)
+        self._last_sent.pop((chat_id, message_id), None)
+        if self._sending == (chat_id, message_id):
+            self._sending_cleared = True
+
+    async def _run(self) -> None:
+        while self._pending:
+            await asyncio.sleep(self.interval)
+            if time.time() < self._flood_until:
+                continue
+            for key in list(self._pending):
+                item = self._pending.pop(key, None)
+                if item is None:
+                    continue
+                bot, text = item
+                self._sending = key
+                self._sending_cleared = False
+                try:
+                    await bot.edit_message_text(key[0], key[1], text=text)
+                    if not self._sending_cleared:
+                        self._last_sent[key] = text
+                except FloodWait as e:
+                    logger.warning(f"FloodWait of {e.x}s, pausing progress updates")
+                    self._flood_until = time.time() + e.x
+                    if not self._sending_cleared:
+                        self._pending.setdefault(key, item)
+                    break
+                except Exception as e:
+                    logger.error(f"Error updating message progress: {e}")
+                finally:
+                    self._sending = None
+
+
+progress_service = ProgressService(Config.PROGRESS_UPDATE_INTERVAL)
+
+
+def progress_text(
+    current: int,
+    total: int,
+    ud_type: str,
+    start: float
+) -> str:
+    """
+    Builds the progress bar text of a transfer.
+
+    Args:
+        current (int): The current amount of data transferred.
+        total (int): The total amount of data to be transferred.
+        ud_type (str): A string to indicate if it is an upload or download progress.
+        start (float): The start time of the transfer.
+
+    Returns:
+        str: The text to show in the status message.
+    """
+    now = time.time()
+    diff = now - start
+
+    percentage = current * 100 / total if total else 0
+    speed = current / diff if diff > 0 else 0
+    elapsed_time = round(diff) * 1000
+    time_to_completion = round((total - current) / speed) * 1000 if speed > 0 and total else 0
+    estimated_total_time = elapsed_time + time_to_completion
+
+    estimated_total_time_str = TimeFormatter(milliseconds=estimated_total_time)
+
+    progress = "[{0}{1}] \nP: {2}%\n".format(
+        ''.join(["█" for _ in range(math.floor(percentage / 5))]),
+        ''.join(["░" for _ in range(20 - math.floor(percentage / 5))]),
+        round(percentage, 2))
+
+    tmp = progress + "{0} of {1}\nSpeed: {2}/s\nETA: {3}\n".format(
+        humanbytes(current),
+        humanbytes(total),
+        humanbytes(speed),
+        estimated_total_time_str
+    )
+    return f"{ud_type}\n {tmp}"
+
+
 async def progress_for_pyrogram(
     current: int,
     total: int,
@@ -21,7 +155,10 @@ async def progress_for_pyrogram(
     start: float
 ):
     """
-    Updates a Telegram message with a progress bar during file transfers.
+    Publishes the progress of a pyrogram transfer to the progress service.
+
+    Pyrogram calls this for every chunk, so it only records the latest
+    status and returns; the message itself is edited by ``progress_service``.
 
     Args:
         current (int): The current amount of data transferred.
@@ -30,43 +167,12 @@ async def progress_for_pyrogram(
         message: The pyrogram message object to edit.
         start (float): The start time of the transfer.
     """
-    
-    last_message_content = ""
-    
-    while current < total:
-        now = time.time()
-        diff = now - start
-        
-        percentage = current * 100 / total
-        speed = current / diff if diff > 0 else 0
-        elapsed_time = round(diff) * 1000
-        time_to_completion = round((total - current) / speed) * 1000 if speed > 0 else 0
-        estimated_total_time = elapsed_time + time_to_completion
-
-        elapsed_time_str = TimeFormatter(milliseconds=elapsed_time)
-        estimated_total_time_str = TimeFormatter(milliseconds=estimated_total_time)
-
-        progress = "[{0}{1}] \nP: {2}%\n".format(
-            ''.join(["█" for _ in range(math.floor(percentage / 5))]),
-            ''.join(["░" for _ in range(20 - math.floor(percentage / 5))]),
-            round(percentage, 2))
-        
-        tmp = progress + "{0} of {1}\nSpeed: {2}/s\nETA: {3}\n".format(
-            humanbytes(current),
-            humanbytes(total),
-            humanbytes(speed),
-            estimated_total_time_str
-        )
-        
-        try:
-            if tmp != last_message_content:
-              await message.edit(
-                text=f"{ud_type}\n {tmp}"
-              )
-              last_message_content = tmp
-            await asyncio.sleep(10) # Update message every 10 seconds
-        except Exception as e:
-          logger.error(f"Error updating message progress for {ud_type}: {e}")
+    progress_service.publish(
+        message._client,
+        message.chat.id,
+        message.message_id,
+        progress_text(current, total, ud_type, start)
+    )
 
 
 def humanbytes(size: Optional[int]) -> str:
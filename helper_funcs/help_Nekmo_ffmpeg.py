@@ -3,8 +3,7 @@ import asyncio
 import os
 import time
 from typing import Optional, List
-from hachoir.metadata import extractMetadata
-from hachoir.parser import createParser
+from helper_funcs.media_info import media_probe
 
 logging.basicConfig(level=logging.DEBUG,
                     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -40,11 +39,10 @@ async def place_water_mark(
         logger.error(f"Watermark file not found: {water_mark_file}")
         return None
 
-      metadata = extractMetadata(createParser(input_file))
-      if not metadata or not metadata.has("width"):
+      width = (await media_probe.probe(input_file)).width
+      if not width:
           logger.error(f"Failed to extract video width from {input_file}")
           return None
-      width = metadata.get("width")
 
       # Create command to shrink watermark
       shrink_watermark_command = [
@@ -101,6 +99,109 @@ async def place_water_mark(
       return None
 
 
+# screenshots are fitted into a square of this size, Telegram's thumbnail limit
+FRAME_SIZE = 320
+# seconds a single frame extraction may take before ffmpeg is killed
+FRAME_TIMEOUT = 120
+
+WATERMARK_POSITIONS = {
+    "top-left": "0:0",
+    "top-right": "(main_w-overlay_w):0",
+    "bottom-left": "0:(main_h-overlay_h)",
+    "bottom-right": "(main_w-overlay_w):(main_h-overlay_h)",
+}
+
+
+async def extract_frames(
+    video_file: str,
+    output_directory: str,
+    timestamps: List[float],
+    water_mark_file: Optional[str] = None,
+    watermark_scale: float = 0.5,
+    watermark_position: str = "bottom-right",
+    size: int = FRAME_SIZE
+) -> List[str]:
+    """Extracts one frame per timestamp with a single ffmpeg process.
+
+    Every timestamp is opened as its own input with an input-side ``-ss``,
+    so ffmpeg seeks to the nearest keyframe instead of decoding the video
+    up to that point. Frames are scaled to fit ``size`` and, if a watermark
+    is given, it is scaled once to a fixed width and overlaid in the same
+    filter graph. ffmpeg is killed after FRAME_TIMEOUT seconds.
+
+    Args:
+      video_file (str): Path to the video file.
+      output_directory (str): Path to the directory for saving the frames.
+      timestamps (List[float]): Seconds into the video of each frame.
+      water_mark_file (str): Optional path of a watermark image.
+      watermark_scale (float): Width of the watermark relative to the frame.
+      watermark_position (str): One of WATERMARK_POSITIONS.
+      size (int): The largest width or height of a frame.
+    Returns:
+      List[str]: The paths of the frames that were written, in order.
+    """
+    if not timestamps:
+        return []
+    if not os.path.lexists(video_file):
+        logger.error(f"Video file not found: {video_file}")
+        return []
+    if water_mark_file and not os.path.lexists(water_mark_file):
+        logger.error(f"Watermark file not found: {water_mark_file}")
+        water_mark_file = None
+    if not os.path.exists(output_directory):
+        os.makedirs(output_directory)
+        logger.info(f"Created output directory: {output_directory}")
+
+    command = ["ffmpeg", "-y", "-v", "error"]
+    for ttl in timestamps:
+        command += ["-ss", str(ttl), "-i", video_file]
+    filters = [
+        f"[{index}:v]scale={size}:{size}:force_original_aspect_ratio=decrease[f{index}]"
+        for index in range(len(timestamps))
+    ]
+    if water_mark_file:
+        command += ["-i", water_mark_file]
+        overlay_position = WATERMARK_POSITIONS.get(watermark_position, WATERMARK_POSITIONS["bottom-right"])
+        # frames are at most size wide, so one fixed-width copy of the still image fits all of them
+        filters.append(
+            f"[{len(timestamps)}:v]scale={max(1, int(size * watermark_scale))}:-1,split={len(timestamps)}"
+            + "".join(f"[w{index}]" for index in range(len(timestamps)))
+        )
+        for index in range(len(timestamps)):
+            filters.append(f"[f{index}][w{index}]overlay={overlay_position}[o{index}]")
+        outputs = [f"[o{index}]" for index in range(len(timestamps))]
+    else:
+        outputs = [f"[f{index}]" for index in range(len(timestamps))]
+    command += ["-filter_complex", ";".join(filters)]
+
+    prefix = os.path.join(output_directory, str(time.time()))
+    frames = [f"{prefix}_{index}.jpg" for index in range(len(timestamps))]
+    for output, frame in zip(outputs, frames):
+        command += ["-map", output, "-frames:v", "1", "-q:v", "2", frame]
+
+    logger.debug(f"Executing command: {' '.join(command)}")
+    process = await asyncio.create_subprocess_exec(
+        *command,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    try:
+        stdout, stderr = await asyncio.wait_for(process.communicate(), timeout=FRAME_TIMEOUT)
+    except asyncio.TimeoutError:
+        process.kill()
+        stdout, stderr = await process.communicate()
+        logger.error(f"Extracting frames of {video_file} timed out after {FRAME_TIMEOUT}s")
+    if process.returncode != 0:
+        logger.error(f"Failed to extract frames of {video_file}: {stderr.decode().strip()}")
+    written = [frame for frame in frames if os.path.exists(frame)]
+    # ffmpeg exits 0 when an output got no frames, so check what was actually written
+    if len(written) != len(frames):
+        logger.error(
+            f"Only {len(written)} of {len(frames)} frames of {video_file} were written: {stderr.decode().strip()}"
+        )
+    return written
+
+
 async def take_screen_shot(video_file: str, output_directory: str, ttl: int) -> Optional[str]:
     """Takes a screenshot from a specific time within a video.
     Args:
@@ -111,35 +212,11 @@ async def take_screen_shot(video_file: str, output_directory: str, ttl: int) ->
       Optional[str]: The path to the screenshot if successful, None otherwise.
     """
     try:
-      if not os.path.lexists(video_file):
-          logger.error(f"Video file not found: {video_file}")
-          return None
-      if not os.path.exists(output_directory):
-          os.makedirs(output_directory)
-          logger.info(f"Created output directory: {output_directory}")
-
-      output_file_name = os.path.join(output_directory, f"{time.time()}.jpg")
-      
-      command = [
-          "ffmpeg",
-          "-ss", str(ttl),
-          "-i", video_file,
-          "-vframes", "1",
-          output_file_name
-      ]
-      logger.debug(f"Executing command: {' '.join(command)}")
-      process = await asyncio.create_subprocess_exec(
-          *command,
-          stdout=asyncio.subprocess.PIPE,
-          stderr=asyncio.subprocess.PIPE,
-      )
-      stdout, stderr = await process.communicate()
-      if process.returncode != 0:
-          logger.error(f"Failed to take screenshot of video {video_file}: {stderr.decode().strip()}")
+      frames = await extract_frames(video_file, output_directory, [ttl])
+      if not frames:
           return None
-
-      logger.info(f"Screenshot taken from {video_file} and saved to {output_file_name}")
-      return output_file_name
+      logger.info(f"Screenshot taken from {video_file} and saved to {frames[0]}")
+      return frames[0]
     except Exception as e:
       logger.error(f"An exception occurred during take_screen_shot: {e}")
       return None
@@ -227,30 +304,19 @@ async def generate_screen_shots(
            logger.error(f"Video file not found: {video_file}")
            return None
 
-        metadata = extractMetadata(createParser(video_file))
-        duration = 0
-        if metadata is not None and metadata.has("duration"):
-            duration = metadata.get('duration').seconds
+        duration = (await media_probe.probe(video_file)).duration
 
         if duration > min_duration:
-            images = []
             ttl_step = duration // no_of_photos
-            current_ttl = ttl_step
-            for _ in range(no_of_photos):
-                ss_img = await take_screen_shot(video_file, output_directory, current_ttl)
-                if ss_img:
-                    if is_watermarkable and wf:
-                        watermarked_image = await place_water_mark(ss_img, os.path.join(output_directory, f"{time.time()}.jpg"), wf)
-                        if watermarked_image:
-                          images.append(watermarked_image)
-                        else:
-                          logger.error(f"Failed to watermark: {ss_img}, skipping screenshot.")
-                          os.remove(ss_img)
-                    else:
-                        images.append(ss_img)
-                else:
-                  logger.error(f"Failed to get screenshot skipping it.")
-                current_ttl += ttl_step
+            timestamps = [ttl_step * (index + 1) for index in range(no_of_photos)]
+            images = await extract_frames(
+                video_file,
+                output_directory,
+                timestamps,
+                water_mark_file=wf if is_watermarkable else None
+            )
+            if len(images) < no_of_photos:
+                logger.error(f"Only got {len(images)} of {no_of_photos} screenshots.")
             return images
         else:
           logger.info(f"Video {video_file} is shorter than {min_duration}")
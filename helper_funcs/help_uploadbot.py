@@ -1,9 +1,13 @@
 import logging
 import os
 import asyncio
-import time
+import math
 from typing import Optional
-import requests
+import aiofiles
+import aiohttp
+from config import Config
+from helper_funcs.direct_download import probe_url
+from helper_funcs.display_progress import progress_service
 
 logging.basicConfig(level=logging.DEBUG,
                     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -31,23 +35,45 @@ def humanbytes(size: Optional[int]) -> str:
     
     return f"{size_formatted} {Dic_powerN[power]}B"
 
-def DetectFileSize(url: str) -> int:
+_session: Optional[aiohttp.ClientSession] = None
+
+
+def get_session() -> aiohttp.ClientSession:
+    """Returns the process-wide HTTP session, creating it on first use.
+
+    Sharing one session keeps connections and DNS lookups pooled across
+    requests instead of opening a new connection for every call.
+    """
+    global _session
+    if _session is None or _session.closed:
+        _session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=100, ttl_dns_cache=300),
+            timeout=aiohttp.ClientTimeout(total=None, sock_connect=30, sock_read=Config.PROCESS_MAX_TIMEOUT)
+        )
+    return _session
+
+
+async def close_session() -> None:
+    """Closes the shared HTTP session on shutdown."""
+    if _session is not None and not _session.closed:
+        await _session.close()
+
+
+async def DetectFileSize(url: str) -> int:
     """
-    Retrieves the content length (file size) from a URL's response headers.
+    Retrieves the content length (file size) of a URL.
+
+    A HEAD request is tried first, following redirects; only servers that
+    do not answer it with a size are asked for a single byte.
     Args:
         url (str): The URL of the file.
     Returns:
         int: The total size of the file if the file size can be retrieved, otherwise 0.
     """
     try:
-        r = requests.get(url, allow_redirects=True, stream=True)
-        r.raise_for_status()  # Raise HTTPError for bad responses (4xx or 5xx)
-        total_size = int(r.headers.get("content-length", 0))
+        total_size = (await probe_url(get_session(), url))["total_length"]
         logger.debug(f"Detected file size: {total_size} bytes for URL: {url}")
         return total_size
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Error while detecting file size for URL {url}: {e}")
-        return 0
     except Exception as e:
        logger.error(f"An unexpected error occurred: {e}")
        return 0
@@ -86,37 +112,32 @@ async def DownLoadFile(
     
     try:
         logger.debug(f"Start downloading file from URL: {url}")
-        r = requests.get(url, allow_redirects=True, stream=True)
-        r.raise_for_status()
-        total_size = int(r.headers.get("content-length", 0))
-        downloaded_size = 0
-        start_time = time.time()
-        last_update = start_time
-        with open(file_name, 'wb') as fd:
-          for chunk in r.iter_content(chunk_size=chunk_size):
-              if chunk:
-                  fd.write(chunk)
+        async with get_session().get(url, allow_redirects=True) as r:
+            r.raise_for_status()
+            total_size = int(r.headers.get("content-length", 0))
+            downloaded_size = 0
+            async with aiofiles.open(file_name, 'wb') as fd:
+              async for chunk in r.content.iter_chunked(chunk_size):
+                  await fd.write(chunk)
                   downloaded_size += len(chunk)
-              now = time.time()
-              diff = now - last_update
-              if client is not None and (diff > 1 or downloaded_size == total_size):
-                 percentage = downloaded_size/total_size *100 if total_size else 0
-                 try:
-                  await client.edit_message_text(
-                      chat_id,
-                      message_id,
-                      text=f"{ud_type}: {humanbytes(downloaded_size)} of {humanbytes(total_size)} ({percentage:.2f}%)"
-                  )
-                  last_update = now
-                 except Exception as e:
-                    logger.error(f"Error while updating Telegram message: {e}")
+                  if client is not None:
+                     percentage = downloaded_size/total_size *100 if total_size else 0
+                     progress_service.publish(
+                         client,
+                         chat_id,
+                         message_id,
+                         f"{ud_type}: {humanbytes(downloaded_size)} of {humanbytes(total_size)} ({percentage:.2f}%)"
+                     )
 
         logger.info(f"Finished downloading file from URL: {url} to {file_name}")
         return file_name
 
-    except requests.exceptions.RequestException as e:
+    except aiohttp.ClientError as e:
         logger.error(f"Error during download from URL {url}: {e}")
         return file_name
     except Exception as e:
         logger.error(f"An unexpected error occurred during download: {e}")
-        return file_name
\ No newline at end of file
+        return file_name
+    finally:
+        if client is not None:
+            progress_service.clear(chat_id, message_id)
\ No newline at end of file
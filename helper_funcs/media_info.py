@@ -0,0 +1,141 @@
+import logging
+import asyncio
+import json
+import os
+from collections import OrderedDict
+from typing import Optional, Dict, Any, Tuple
+
+logging.basicConfig(level=logging.DEBUG,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# probed files whose results are kept in memory
+MEDIA_INFO_CACHE_SIZE = 256
+
+
+class MediaInfo:
+    """What the upload paths need to know about a media file.
+
+    Attributes:
+        duration (int): The length in whole seconds.
+        width (int): The width of the first video stream.
+        height (int): The height of the first video stream.
+        video_codec (str): The codec of the first video stream, if any.
+        audio_codec (str): The codec of the first audio stream, if any.
+        bitrate (int): The overall bitrate in bits per second.
+    """
+
+    def __init__(
+        self,
+        duration: int = 0,
+        width: int = 0,
+        height: int = 0,
+        video_codec: Optional[str] = None,
+        audio_codec: Optional[str] = None,
+        bitrate: int = 0
+    ):
+        self.duration = duration
+        self.width = width
+        self.height = height
+        self.video_codec = video_codec
+        self.audio_codec = audio_codec
+        self.bitrate = bitrate
+
+
+def _from_ffprobe(output: Dict[str, Any]) -> MediaInfo:
+    info = MediaInfo()
+    container = output.get("format", {})
+    info.duration = int(float(container.get("duration") or 0))
+    info.bitrate = int(container.get("bit_rate") or 0)
+    for stream in output.get("streams", []):
+        if stream.get("codec_type") == "video" and info.video_codec is None:
+            info.video_codec = stream.get("codec_name")
+            info.width = int(stream.get("width") or 0)
+            info.height = int(stream.get("height") or 0)
+            if not info.duration:
+                info.duration = int(float(stream.get("duration") or 0))
+        elif stream.get("codec_type") == "audio" and info.audio_codec is None:
+            info.audio_codec = stream.get("codec_name")
+            if not info.duration:
+                info.duration = int(float(stream.get("duration") or 0))
+    return info
+
+
+def _from_hachoir(path: str) -> MediaInfo:
+    """Fallback for hosts without ffprobe; runs in an executor."""
+    from hachoir.metadata import extractMetadata
+    from hachoir.parser import createParser
+    info = MediaInfo()
+    parser = createParser(path)
+    if parser is None:
+        return info
+    with parser:
+        metadata = extractMetadata(parser)
+    if metadata is not None:
+        if metadata.has("duration"):
+            info.duration = metadata.get("duration").seconds
+        if metadata.has("width"):
+            info.width = metadata.get("width")
+        if metadata.has("height"):
+            info.height = metadata.get("height")
+        if metadata.has("bit_rate"):
+            info.bitrate = int(metadata.get("bit_rate"))
+    return info
+
+
+class MediaProbe:
+    """Probes media files once and shares the result between callers.
+
+    Results are cached by path, modification time and size, so a file
+    that is rewritten (for example by a watermark step) is probed again.
+    ffprobe reads only the headers it needs; hachoir is used off the event
+    loop when ffprobe is not installed.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, float, int], MediaInfo]" = OrderedDict()
+
+    async def probe(self, path: str) -> MediaInfo:
+        """Returns the MediaInfo of a file; an empty one if it cannot be read."""
+        try:
+            stat = os.stat(path)
+        except OSError as e:
+            logger.error(f"Failed to get metadata for {path}: {e}")
+            return MediaInfo()
+        key = (os.path.abspath(path), stat.st_mtime, stat.st_size)
+        info = self._entries.get(key)
+        if info is not None:
+            self._entries.move_to_end(key)
+            return info
+        info = await self._probe(path)
+        self._entries[key] = info
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return info
+
+    async def _probe(self, path: str) -> MediaInfo:
+        try:
+            process = await asyncio.create_subprocess_exec(
+                "ffprobe", "-v", "quiet", "-print_format", "json",
+                "-show_format", "-show_streams", path,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+            )
+            stdout, stderr = await process.communicate()
+            if process.returncode == 0:
+                return _from_ffprobe(json.loads(stdout))
+            logger.warning(f"ffprobe failed on {path}, falling back to hachoir")
+        except FileNotFoundError:
+            logger.debug("ffprobe is not installed, using hachoir")
+        except Exception as e:
+            logger.error(f"ffprobe failed on {path}: {e}")
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(None, _from_hachoir, path)
+        except Exception as e:
+            logger.error(f"Failed to get metadata for {path}: {e}")
+            return MediaInfo()
+
+
+media_probe = MediaProbe(max_entries=MEDIA_INFO_CACHE_SIZE)
\ No newline at end of file
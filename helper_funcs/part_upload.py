@@ -0,0 +1,193 @@
+import logging
+import asyncio
+import math
+import mimetypes
+from typing import Optional, AsyncIterator, Callable, Awaitable, Union
+from pyrogram import raw, types, utils
+from config import Config
+from helper_funcs.upload_engine import PART_SIZE, BIG_FILE_SIZE, save_part, input_file, upload_engine
+
+logging.basicConfig(level=logging.DEBUG,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+ProgressCallback = Callable[[int, int], Awaitable[None]]
+
+
+def _raise_failed(tasks) -> None:
+    """Re-raises the error of the first finished task that failed."""
+    for task in tasks:
+        if task.done() and not task.cancelled() and task.exception() is not None:
+            raise task.exception()
+
+
+async def upload_stream(
+    bot,
+    parts: AsyncIterator[bytes],
+    total_size: int,
+    file_name: str,
+    progress: Optional[ProgressCallback] = None
+) -> Union[raw.types.InputFile, raw.types.InputFileBig]:
+    """Uploads a file to Telegram while its bytes are still arriving.
+
+    ``parts`` must yield PART_SIZE pieces (the last one may be shorter)
+    adding up to ``total_size``. They go through a ring buffer of
+    Config.STREAM_UPLOAD_BUFFER_PARTS parts to a few concurrent part
+    uploaders, so memory stays bounded and the producer is slowed down
+    if Telegram is slower than the source. The uploaders share the media
+    sessions of ``upload_engine`` rather than the client's main session.
+
+    Args:
+        bot: The pyrogram client used for the upload.
+        parts (AsyncIterator[bytes]): The file content, split into parts.
+        total_size (int): The size of the file in bytes.
+        file_name (str): The name Telegram should store the file under.
+        progress (ProgressCallback): Awaited with (uploaded, total) after each part.
+
+    Returns:
+        The InputFile or InputFileBig to hand to a send request.
+    """
+    total_parts = max(1, math.ceil(total_size / PART_SIZE))
+    is_big = total_size > BIG_FILE_SIZE
+    file_id = bot.rnd_id()
+    buffer = asyncio.Queue(maxsize=Config.STREAM_UPLOAD_BUFFER_PARTS)
+    uploaded = 0
+
+    async def produce():
+        index = 0
+        received = 0
+        async for data in parts:
+            await buffer.put((index, data))
+            index += 1
+            received += len(data)
+        if received != total_size or index != total_parts:
+            raise ValueError(f"Stream ended after {received} of {total_size} bytes")
+
+    async def consume(send):
+        nonlocal uploaded
+        while True:
+            index, data = await buffer.get()
+            try:
+                await save_part(send, file_id, index, total_parts, data, is_big)
+                uploaded += len(data)
+                if progress is not None:
+                    try:
+                        await progress(uploaded, total_size)
+                    except Exception as e:
+                        logger.error(f"Progress callback failed: {e}")
+            finally:
+                buffer.task_done()
+
+    sends = [session.send for session in await upload_engine.get_sessions(bot)] or [bot.send]
+    consumers = [
+        asyncio.create_task(consume(sends[index % len(sends)]))
+        for index in range(Config.STREAM_UPLOAD_WORKERS)
+    ]
+    producer = asyncio.create_task(produce())
+    joined = None
+    try:
+        # consumers only ever finish by failing, so watch them while waiting
+        await asyncio.wait([producer, *consumers], return_when=asyncio.FIRST_COMPLETED)
+        _raise_failed([producer, *consumers])
+        joined = asyncio.create_task(buffer.join())
+        await asyncio.wait([joined, *consumers], return_when=asyncio.FIRST_COMPLETED)
+        _raise_failed(consumers)
+    finally:
+        tasks = [producer, *consumers] + ([joined] if joined else [])
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    return input_file(file_id, total_size, file_name)
+
+
+async def send_uploaded_media(
+    bot,
+    chat_id: int,
+    file: Union[raw.types.InputFile, raw.types.InputFileBig],
+    tg_send_type: str,
+    file_name: str,
+    mime_type: Optional[str] = None,
+    caption: str = "",
+    parse_mode: Optional[str] = None,
+    duration: int = 0,
+    width: int = 0,
+    height: int = 0,
+    thumb: Optional[str] = None,
+    reply_to_message_id: Optional[int] = None
+) -> Optional["types.Message"]:
+    """Sends a file that was already uploaded in parts.
+
+    Args:
+        bot: The pyrogram client.
+        chat_id (int): Where to send the file.
+        file: The InputFile or InputFileBig of the upload.
+        tg_send_type (str): "audio", "file", "vm" or "video", as in the callbacks.
+        file_name (str): The file name shown to the user.
+        mime_type (str): The MIME type; guessed from the file name if missing.
+        caption (str): The caption of the message.
+        parse_mode (str): The parse mode of the caption; the client's default if missing.
+        duration (int): The duration of audio and video, in seconds.
+        width (int): The width of a video, or the length of a video note.
+        height (int): The height of a video.
+        thumb (str): Optional path of a JPEG thumbnail.
+        reply_to_message_id (int): The message to reply to.
+
+    Returns:
+        Optional[types.Message]: The sent message.
+    """
+    attributes = [raw.types.DocumentAttributeFilename(file_name=file_name)]
+    if tg_send_type == "video":
+        attributes.append(raw.types.DocumentAttributeVideo(duration=duration, w=width, h=height, supports_streaming=True))
+    elif tg_send_type == "vm":
+        attributes.append(raw.types.DocumentAttributeVideo(duration=duration, w=width, h=width, round_message=True))
+    elif tg_send_type == "audio":
+        attributes.append(raw.types.DocumentAttributeAudio(duration=duration))
+    if tg_send_type == "vm":
+        caption = ""
+    if parse_mode is None:
+        parse_mode = bot.parse_mode
+    media = raw.types.InputMediaUploadedDocument(
+        file=file,
+        mime_type=mime_type or mimetypes.guess_type(file_name)[0] or "application/octet-stream",
+        thumb=await bot.save_file(thumb) if thumb else None,
+        attributes=attributes,
+        force_file=tg_send_type == "file" or None
+    )
+    r = await bot.send(
+        raw.functions.messages.SendMedia(
+            peer=await bot.resolve_peer(chat_id),
+            media=media,
+            reply_to_msg_id=reply_to_message_id,
+            random_id=bot.rnd_id(),
+            **await utils.parse_text_entities(bot, caption, parse_mode, None)
+        )
+    )
+    for i in r.updates:
+        if isinstance(i, (raw.types.UpdateNewMessage, raw.types.UpdateNewChannelMessage)):
+            return await types.Message._parse(
+                bot, i.message,
+                {i.id: i for i in r.users},
+                {i.id: i for i in r.chats}
+            )
+    return None
+
+
+async def send_uploaded_document(
+    bot,
+    chat_id: int,
+    file: Union[raw.types.InputFile, raw.types.InputFileBig],
+    file_name: str,
+    mime_type: str,
+    caption: str = "",
+    thumb: Optional[str] = None,
+    reply_to_message_id: Optional[int] = None
+) -> Optional["types.Message"]:
+    """Sends a file that was already uploaded in parts as a document."""
+    return await send_uploaded_media(
+        bot, chat_id, file, "file", file_name,
+        mime_type=mime_type,
+        caption=caption,
+        thumb=thumb,
+        reply_to_message_id=reply_to_message_id
+    )
\ No newline at end of file
@@ -0,0 +1,86 @@
+import logging
+import asyncio
+from typing import Dict, List, Tuple, Callable, Awaitable, Optional
+from config import Config
+
+logging.basicConfig(level=logging.DEBUG,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+StageHandler = Callable[[], Awaitable[bool]]
+
+
+class Pipeline:
+    """Moves jobs through ordered stages, each with its own worker pool.
+
+    Every stage has a fixed number of workers and a bounded queue feeding
+    it. A job is a dict mapping stage names to handlers; a worker runs the
+    handler for its stage and, if it returns True, hands the job to the next
+    stage's queue. A full queue holds the upstream worker back, so a slow
+    stage throttles the ones before it instead of piling up files on disk.
+
+    Because stages run independently, one job can upload while another
+    downloads and a third is being thumbnailed.
+    """
+
+    def __init__(self, stages: List[Tuple[str, int]], queue_size: int):
+        self.stages = stages
+        self.queue_size = queue_size
+        self._queues: Optional[Dict[str, asyncio.Queue]] = None
+        self._workers = []
+
+    def _start(self) -> None:
+        self._queues = {name: asyncio.Queue(maxsize=self.queue_size) for name, _ in self.stages}
+        for index, (name, workers) in enumerate(self.stages):
+            for _ in range(workers):
+                self._workers.append(asyncio.create_task(self._worker(index)))
+        logger.info(f"Pipeline started with stages {self.stages}")
+
+    def queued(self, name: str) -> int:
+        """Returns how many jobs are waiting for a stage."""
+        return self._queues[name].qsize() if self._queues else 0
+
+    async def process(self, handlers: Dict[str, StageHandler]) -> None:
+        """Runs a job through every stage and waits until it leaves the pipeline.
+
+        Args:
+            handlers (Dict[str, StageHandler]): One handler per stage name.
+                A handler returns True to pass the job on, False to stop.
+        """
+        if self._queues is None:
+            self._start()
+        done = asyncio.get_running_loop().create_future()
+        await self._queues[self.stages[0][0]].put((handlers, done))
+        await done
+
+    async def _worker(self, index: int) -> None:
+        name = self.stages[index][0]
+        queue = self._queues[name]
+        while True:
+            handlers, done = await queue.get()
+            try:
+                if done.done():
+                    continue
+                try:
+                    proceed = await handlers[name]()
+                except Exception as e:
+                    logger.error(f"Pipeline stage {name} failed: {e}")
+                    if not done.done():
+                        done.set_exception(e)
+                    continue
+                if proceed and index + 1 < len(self.stages):
+                    await self._queues[self.stages[index + 1][0]].put((handlers, done))
+                elif not done.done():
+                    done.set_result(None)
+            finally:
+                queue.task_done()
+
+
+job_pipeline = Pipeline(
+    stages=[
+        ("download", Config.MAX_CONCURRENT_DOWNLOADS),
+        ("postprocess", Config.MAX_CONCURRENT_TRANSCODES),
+        ("upload", Config.MAX_CONCURRENT_UPLOADS)
+    ],
+    queue_size=Config.PIPELINE_QUEUE_SIZE
+)
\ No newline at end of file
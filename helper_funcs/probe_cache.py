@@ -0,0 +1,133 @@
+import logging
+import asyncio
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from typing import Optional, Dict, Any, Tuple
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+from config import Config
+
+logging.basicConfig(level=logging.DEBUG,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# query parameters that never change what a link points to
+TRACKING_PARAMS = ("utm_source", "utm_medium", "utm_campaign", "utm_term", "utm_content", "si", "feature", "fbclid", "igshid")
+
+
+def normalize_url(url: str) -> str:
+    """Normalizes a URL so equivalent links share one cache entry.
+
+    The scheme and host are lower-cased, the fragment and tracking
+    parameters are dropped and the remaining query parameters are sorted.
+    """
+    parts = urlsplit(url.strip())
+    query = sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if key.lower() not in TRACKING_PARAMS
+    )
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path, urlencode(query), ""))
+
+
+def cache_key(url: str, username: Optional[str] = None, password: Optional[str] = None) -> str:
+    """Returns the cache key for a URL and the credentials it was probed with."""
+    credentials = hashlib.sha256(f"{username or ''}:{password or ''}".encode("utf8")).hexdigest()
+    return hashlib.sha256(f"{normalize_url(url)}|{credentials}".encode("utf8")).hexdigest()
+
+
+class ProbeCache:
+    """Caches ``yt-dlp -j`` results with a TTL and LRU eviction.
+
+    Entries live in memory and, depending on Config.PROBE_CACHE_BACKEND,
+    also on disk ("disk") or in Mongo ("mongo") so they survive restarts
+    and can be shared between instances. An empty dict is cached for links
+    yt-dlp could not extract, so direct links are not probed again either.
+    """
+
+    def __init__(self, max_entries: int, ttl: int, backend: str):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.backend = backend
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._directory = os.path.join(Config.DOWNLOAD_LOCATION, ".probe_cache")
+
+    async def get(self, url: str, username: Optional[str] = None, password: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Returns the cached probe for a URL, or None on a miss."""
+        key = cache_key(url, username, password)
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = await self._load(key)
+            if entry is not None:
+                self._remember(key, entry)
+        if entry is None:
+            return None
+        expires_at, data = entry
+        if expires_at < time.time():
+            self._entries.pop(key, None)
+            return None
+        self._entries.move_to_end(key)
+        logger.debug(f"Probe cache hit for {url}")
+        return data
+
+    async def set(self, url: str, username: Optional[str], password: Optional[str], data: Dict[str, Any]) -> None:
+        """Caches the probe result of a URL."""
+        key = cache_key(url, username, password)
+        entry = (time.time() + self.ttl, data)
+        self._remember(key, entry)
+        try:
+            await self._store(key, entry)
+        except Exception as e:
+            logger.error(f"Failed to persist probe cache entry: {e}")
+
+    def _remember(self, key: str, entry: Tuple[float, Dict[str, Any]]) -> None:
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def _load(self, key: str) -> Optional[Tuple[float, Dict[str, Any]]]:
+        try:
+            if self.backend == "disk":
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(None, self._read_file, key)
+            if self.backend == "mongo":
+                from database.access import clinton
+                return await clinton.get_probe(key)
+        except Exception as e:
+            logger.error(f"Failed to load probe cache entry: {e}")
+        return None
+
+    async def _store(self, key: str, entry: Tuple[float, Dict[str, Any]]) -> None:
+        if self.backend == "disk":
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, self._write_file, key, entry)
+        elif self.backend == "mongo":
+            from database.access import clinton
+            await clinton.set_probe(key, entry[1], entry[0])
+
+    def _read_file(self, key: str) -> Optional[Tuple[float, Dict[str, Any]]]:
+        path = os.path.join(self._directory, key + ".json")
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf8") as f:
+            stored = json.load(f)
+        if stored["expires_at"] < time.time():
+            os.remove(path)
+            return None
+        return stored["expires_at"], stored["data"]
+
+    def _write_file(self, key: str, entry: Tuple[float, Dict[str, Any]]) -> None:
+        os.makedirs(self._directory, exist_ok=True)
+        path = os.path.join(self._directory, key + ".json")
+        with open(path + ".tmp", "w", encoding="utf8") as f:
+            json.dump({"expires_at": entry[0], "data": entry[1]}, f, ensure_ascii=False)
+        os.replace(path + ".tmp", path)
+
+
+probe_cache = ProbeCache(
+    max_entries=Config.PROBE_CACHE_SIZE,
+    ttl=Config.PROBE_CACHE_TTL,
+    backend=Config.PROBE_CACHE_BACKEND
+)
\ No newline at end of file
@@ -0,0 +1,110 @@
+import logging
+import asyncio
+import json
+import os
+import time
+from collections import OrderedDict
+from typing import Optional, Dict, Any, Tuple
+from config import Config
+
+logging.basicConfig(level=logging.DEBUG,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# the only parts of a probe the format buttons and callbacks use
+PROBE_FIELDS = ("title", "fulltitle", "duration")
+FORMAT_FIELDS = ("format_id", "format_note", "format", "ext", "filesize")
+
+
+def trim_probe(response_json: Dict[str, Any]) -> Dict[str, Any]:
+    """Keeps only the fields of a yt-dlp probe that callbacks need."""
+    probe = {field: response_json[field] for field in PROBE_FIELDS if field in response_json}
+    if "formats" in response_json:
+        probe["formats"] = [
+            {field: f[field] for field in FORMAT_FIELDS if field in f}
+            for f in response_json["formats"]
+        ]
+    return probe
+
+
+class ProbeStore:
+    """Hands yt-dlp probes from ``echo`` to the format callbacks.
+
+    Probes are keyed by the chat and message id of the link, so two links
+    from the same user no longer overwrite each other. The store is bounded
+    and entries expire after a TTL. With Config.PROBE_STORE_SPILL set,
+    entries pushed out by the size bound are written to disk off the event
+    loop instead of being dropped.
+    """
+
+    def __init__(self, max_entries: int, ttl: int, spill: bool):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.spill = spill
+        self._entries: "OrderedDict[Tuple[int, int], Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._directory = os.path.join(Config.DOWNLOAD_LOCATION, ".probe_store")
+
+    def _path(self, key: Tuple[int, int]) -> str:
+        return os.path.join(self._directory, f"{key[0]}_{key[1]}.json")
+
+    def put(self, chat_id: int, message_id: int, response_json: Dict[str, Any]) -> None:
+        """Stores the trimmed probe of the link in a message."""
+        self._entries[(chat_id, message_id)] = (time.time() + self.ttl, trim_probe(response_json))
+        self._entries.move_to_end((chat_id, message_id))
+        now = time.time()
+        while len(self._entries) > self.max_entries:
+            key, entry = self._entries.popitem(last=False)
+            if self.spill and entry[0] > now:
+                asyncio.get_running_loop().run_in_executor(None, self._write, key, entry)
+
+    async def get(self, chat_id: int, message_id: int) -> Optional[Dict[str, Any]]:
+        """Returns the probe of the link in a message, or None if it is gone."""
+        key = (chat_id, message_id)
+        entry = self._entries.get(key)
+        if entry is None and self.spill:
+            loop = asyncio.get_running_loop()
+            entry = await loop.run_in_executor(None, self._read, key)
+        if entry is None or entry[0] < time.time():
+            self._entries.pop(key, None)
+            return None
+        return entry[1]
+
+    async def pop(self, chat_id: int, message_id: int) -> None:
+        """Forgets the probe of a message once its job is done."""
+        key = (chat_id, message_id)
+        self._entries.pop(key, None)
+        if self.spill:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, self._remove, key)
+
+    def _write(self, key: Tuple[int, int], entry: Tuple[float, Dict[str, Any]]) -> None:
+        try:
+            os.makedirs(self._directory, exist_ok=True)
+            with open(self._path(key), "w", encoding="utf8") as f:
+                json.dump({"expires_at": entry[0], "data": entry[1]}, f, ensure_ascii=False)
+        except Exception as e:
+            logger.error(f"Failed to spill probe {key}: {e}")
+
+    def _read(self, key: Tuple[int, int]) -> Optional[Tuple[float, Dict[str, Any]]]:
+        try:
+            with open(self._path(key), "r", encoding="utf8") as f:
+                stored = json.load(f)
+            return stored["expires_at"], stored["data"]
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.error(f"Failed to read spilled probe {key}: {e}")
+            return None
+
+    def _remove(self, key: Tuple[int, int]) -> None:
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+
+probe_store = ProbeStore(
+    max_entries=Config.PROBE_STORE_SIZE,
+    ttl=Config.PROBE_STORE_TTL,
+    spill=Config.PROBE_STORE_SPILL
+)
\ No newline at end of file
@@ -0,0 +1,204 @@
+import logging
+import asyncio
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Optional, Dict, Callable, Awaitable, Any, Deque, List
+from config import Config
+
+logging.basicConfig(level=logging.DEBUG,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+PositionCallback = Callable[[int], Awaitable[None]]
+
+
+class _Job:
+    """A job waiting for, or holding, a scheduler slot."""
+
+    def __init__(self, user_id: int, on_queued: Optional[PositionCallback]):
+        self.user_id = user_id
+        self.on_queued = on_queued
+        self.ready = asyncio.Event()
+        self.position = 0
+
+
+class JobScheduler:
+    """Runs user jobs with global and per-user concurrency limits.
+
+    Jobs that cannot start straight away wait in a per-user queue. Free
+    slots are handed out round-robin between users, so one user with many
+    links cannot starve everyone else. Waiting jobs are told their position
+    whenever it changes. A running job that only waits on another one can
+    hand its slot back for the wait with ``released``.
+
+    The scheduler only decides when a job is admitted; how many jobs run a
+    given stage at once is left to ``helper_funcs.pipeline``.
+    """
+
+    def __init__(self, max_jobs: int, max_jobs_per_user: int):
+        self.max_jobs = max_jobs
+        self.max_jobs_per_user = max_jobs_per_user
+        self._queues: Dict[int, Deque[_Job]] = {}
+        self._order: Deque[int] = deque()
+        self._running: Dict[int, int] = {}
+        self._total_running = 0
+        self._tasks = set()
+
+    @property
+    def pending(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    @property
+    def running(self) -> int:
+        return self._total_running
+
+    def submit(
+        self,
+        user_id: int,
+        job: Callable[[], Awaitable[Any]],
+        on_queued: Optional[PositionCallback] = None
+    ) -> asyncio.Task:
+        """Schedules a job in the background and returns its task.
+
+        Handlers should use this instead of awaiting ``run`` so a queued job
+        never holds one of the client's update workers.
+        """
+        task = asyncio.create_task(self.run(user_id, job, on_queued))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def run(
+        self,
+        user_id: int,
+        job: Callable[[], Awaitable[Any]],
+        on_queued: Optional[PositionCallback] = None
+    ) -> Any:
+        """Waits for a slot, runs the job and returns its result.
+
+        Args:
+            user_id (int): The user the job belongs to.
+            job (Callable): Called without arguments once a slot is free.
+            on_queued (PositionCallback): Awaited with the 1-based queue
+                position while the job waits.
+
+        Returns:
+            Any: Whatever the job returns.
+        """
+        await self._acquire(user_id, on_queued)
+        try:
+            return await job()
+        except Exception as e:
+            logger.error(f"Job for user {user_id} failed: {e}")
+        finally:
+            self._release(user_id)
+
+    @asynccontextmanager
+    async def released(self, user_id: int):
+        """Frees the slot of a running job while it waits on something else.
+
+        Followers of an identical download use this so they do not hold
+        slots while only the leader works. The slot is queued for again on
+        exit; ``run`` still owns it and frees it when the job ends.
+        """
+        self._release(user_id)
+        try:
+            yield
+        except BaseException:
+            self._take(user_id)
+            raise
+        try:
+            await self._acquire(user_id)
+        except asyncio.CancelledError:
+            self._take(user_id)
+            raise
+
+    async def _acquire(self, user_id: int, on_queued: Optional[PositionCallback] = None) -> None:
+        """Queues for a slot and waits until it is handed out."""
+        entry = _Job(user_id, on_queued)
+        if user_id not in self._queues:
+            self._queues[user_id] = deque()
+            self._order.append(user_id)
+        self._queues[user_id].append(entry)
+        self._dispatch()
+        try:
+            await entry.ready.wait()
+        except asyncio.CancelledError:
+            if entry.ready.is_set():
+                self._release(user_id)
+            else:
+                self._remove(entry)
+            raise
+
+    def _take(self, user_id: int) -> None:
+        self._running[user_id] = self._running.get(user_id, 0) + 1
+        self._total_running += 1
+
+    def _remove(self, entry: _Job) -> None:
+        queue = self._queues.get(entry.user_id)
+        if queue is not None and entry in queue:
+            queue.remove(entry)
+            self._drop_if_idle(entry.user_id)
+        self._dispatch()
+
+    def _release(self, user_id: int) -> None:
+        self._total_running -= 1
+        self._running[user_id] -= 1
+        if not self._running[user_id]:
+            del self._running[user_id]
+        self._drop_if_idle(user_id)
+        self._dispatch()
+
+    def _drop_if_idle(self, user_id: int) -> None:
+        if not self._queues.get(user_id) and user_id in self._queues:
+            del self._queues[user_id]
+            self._order.remove(user_id)
+
+    def _dispatch(self) -> None:
+        """Hands free slots to waiting jobs, one user at a time."""
+        skipped = 0
+        while self._total_running < self.max_jobs and self._order and skipped < len(self._order):
+            user_id = self._order[0]
+            self._order.rotate(-1)
+            if self._running.get(user_id, 0) >= self.max_jobs_per_user:
+                skipped += 1
+                continue
+            skipped = 0
+            entry = self._queues[user_id].popleft()
+            self._take(user_id)
+            self._drop_if_idle(user_id)
+            entry.ready.set()
+        self._notify_positions()
+
+    def _pending_order(self) -> List[_Job]:
+        """Returns the waiting jobs in the order they would be started."""
+        queues = [list(self._queues[user_id]) for user_id in self._order]
+        order = []
+        depth = 0
+        while any(depth < len(queue) for queue in queues):
+            order.extend(queue[depth] for queue in queues if depth < len(queue))
+            depth += 1
+        return order
+
+    def _notify_positions(self) -> None:
+        for position, entry in enumerate(self._pending_order(), start=1):
+            if entry.position == position or entry.on_queued is None:
+                entry.position = position
+                continue
+            entry.position = position
+            task = asyncio.create_task(self._safe_notify(entry.on_queued, position))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    @staticmethod
+    async def _safe_notify(on_queued: PositionCallback, position: int) -> None:
+        try:
+            await on_queued(position)
+        except Exception as e:
+            logger.error(f"Failed to report queue position: {e}")
+
+
+job_scheduler = JobScheduler(
+    max_jobs=Config.MAX_CONCURRENT_JOBS,
+    max_jobs_per_user=Config.MAX_JOBS_PER_USER
+)
\ No newline at end of file
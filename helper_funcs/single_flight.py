@@ -0,0 +1,71 @@
+import logging
+import asyncio
+from typing import Optional, Dict, Tuple
+from helper_funcs.display_progress import progress_service
+
+logging.basicConfig(level=logging.DEBUG,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+class Flight:
+    """A download running on behalf of every identical request.
+
+    Attributes:
+        chat_id (int): The chat of the leading job's status message.
+        message_id (int): The id of that status message.
+        file_id (str): Set by the leader once the file is on Telegram.
+    """
+
+    def __init__(self, chat_id: int, message_id: int):
+        self.chat_id = chat_id
+        self.message_id = message_id
+        self.file_id: Optional[str] = None
+        self.landed = asyncio.Event()
+
+
+class InFlight:
+    """Coalesces identical jobs so only one of them downloads.
+
+    The first job for a key becomes the leader. Jobs with the same key that
+    arrive while it runs follow it: their status message mirrors the
+    leader's progress, and when the leader lands they re-send the file_id
+    it uploaded. If the leader failed, one follower takes over as the next
+    leader.
+    """
+
+    def __init__(self):
+        self._flights: Dict[str, Flight] = {}
+
+    def claim(self, key: str, chat_id: int, message_id: int) -> Tuple[Flight, bool]:
+        """Joins the flight for a key, starting it if there is none.
+
+        Returns:
+            Tuple[Flight, bool]: The flight, and whether the caller leads it.
+                A leader must call ``land`` when its job ends.
+        """
+        flight = self._flights.get(key)
+        if flight is not None:
+            return flight, False
+        flight = Flight(chat_id, message_id)
+        self._flights[key] = flight
+        return flight, True
+
+    async def follow(self, flight: Flight, chat_id: int, message_id: int) -> Optional[str]:
+        """Waits for the leader, showing its progress; returns its file_id."""
+        logger.info(f"Job {chat_id}/{message_id} follows {flight.chat_id}/{flight.message_id}")
+        progress_service.follow(flight.chat_id, flight.message_id, chat_id, message_id)
+        try:
+            await flight.landed.wait()
+        finally:
+            progress_service.unfollow(flight.chat_id, flight.message_id, chat_id, message_id)
+        return flight.file_id
+
+    def land(self, key: str, flight: Flight) -> None:
+        """Ends a flight and wakes its followers."""
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+        flight.landed.set()
+
+
+in_flight = InFlight()
\ No newline at end of file
@@ -0,0 +1,63 @@
+import logging
+import asyncio
+import io
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+from config import Config
+
+logging.basicConfig(level=logging.DEBUG,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Telegram ignores thumbnails bigger than this on either side, or in bytes
+THUMBNAIL_SIZE = 320
+THUMBNAIL_MAX_BYTES = 200 * 1024
+# JPEG qualities tried in turn until the thumbnail is small enough
+THUMBNAIL_QUALITIES = (90, 80, 70, 60, 50, 40, 30)
+
+
+def normalize_thumbnail(source: str, destination: str) -> int:
+    """Writes a JPEG of at most 320px and 200 KB made from any image.
+
+    JPEG sources are decoded at a reduced scale with ``draft`` and the
+    image is downscaled with ``thumbnail``, so a large photo is never
+    decoded or resized at full size.
+
+    Returns:
+        int: The size of the written thumbnail in bytes.
+    """
+    from PIL import Image
+    with Image.open(source) as img:
+        img.draft("RGB", (THUMBNAIL_SIZE, THUMBNAIL_SIZE))
+        img = img.convert("RGB")
+    img.thumbnail((THUMBNAIL_SIZE, THUMBNAIL_SIZE), Image.LANCZOS)
+    for quality in THUMBNAIL_QUALITIES:
+        data = io.BytesIO()
+        img.save(data, "JPEG", quality=quality, optimize=True)
+        if data.tell() <= THUMBNAIL_MAX_BYTES:
+            break
+    with open(destination, "wb") as f:
+        f.write(data.getvalue())
+    return data.tell()
+
+
+class ThumbnailProcessor:
+    """Normalizes thumbnails in worker processes, off the event loop."""
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    async def process(self, source: str, destination: str) -> str:
+        """Writes the normalized thumbnail of ``source`` to ``destination``."""
+        if self._pool is None:
+            context = multiprocessing.get_context("spawn")
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+        loop = asyncio.get_running_loop()
+        size = await loop.run_in_executor(self._pool, normalize_thumbnail, source, destination)
+        logger.debug(f"Thumbnail of {source} is {size} bytes")
+        return destination
+
+
+thumbnail_processor = ThumbnailProcessor(workers=Config.THUMBNAIL_WORKERS)
\ No newline at end of file
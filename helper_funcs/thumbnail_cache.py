@@ -0,0 +1,132 @@
+import logging
+import asyncio
+import hashlib
+import os
+import shutil
+from functools import partial
+from typing import Optional, Dict
+from config import Config
+from helper_funcs.thumbnail import thumbnail_processor
+
+logging.basicConfig(level=logging.DEBUG,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+class ThumbnailCache:
+    """Keeps processed custom thumbnails on disk.
+
+    Entries are keyed by the Telegram ``file_unique_id`` of the photo, so a
+    thumbnail is downloaded and converted once, not once per upload. Each
+    job gets its own hard link (or copy) of the cached file, which it may
+    delete when it is done. The least recently used entries are removed
+    once the cache grows past Config.THUMBNAIL_CACHE_SIZE bytes.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._loading: Dict[str, asyncio.Future] = {}
+
+    def _path(self, file_id: str, file_unique_id: Optional[str]) -> str:
+        key = file_unique_id or hashlib.sha256(file_id.encode("utf8")).hexdigest()
+        return os.path.join(self.directory, key + ".jpg")
+
+    async def get(self, bot, file_id: str, file_unique_id: Optional[str] = None) -> str:
+        """Returns the path of the processed thumbnail, fetching it if needed.
+
+        Args:
+            bot: The pyrogram client used to download the photo.
+            file_id (str): The file id of the photo.
+            file_unique_id (str): Its unique id; the file id is hashed if missing.
+
+        Returns:
+            str: The path of the cached JPEG. Do not delete it, use ``copy_to``.
+        """
+        path = self._path(file_id, file_unique_id)
+        loop = asyncio.get_running_loop()
+        if await loop.run_in_executor(None, self._touch, path):
+            return path
+        loading = self._loading.get(path)
+        if loading is not None:
+            return await asyncio.shield(loading)
+        loading = loop.create_future()
+        self._loading[path] = loading
+        try:
+            await self._fetch(bot, file_id, path)
+            loading.set_result(path)
+        except Exception as e:
+            loading.set_exception(e)
+            # consume the exception if no other job was waiting for it
+            loading.exception()
+            raise
+        finally:
+            del self._loading[path]
+        return path
+
+    async def copy_to(self, path: str, destination: str) -> str:
+        """Gives a job its own copy of a cached thumbnail."""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._link, path, destination)
+        return destination
+
+    async def _fetch(self, bot, file_id: str, path: str) -> None:
+        download = path + ".download"
+        try:
+            downloaded = await bot.download_media(message=file_id, file_name=download)
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, partial(os.makedirs, self.directory, exist_ok=True))
+            await thumbnail_processor.process(downloaded, path + ".tmp")
+            await loop.run_in_executor(None, self._store, path)
+        finally:
+            for leftover in (download, path + ".tmp"):
+                if os.path.exists(leftover):
+                    os.remove(leftover)
+        logger.info(f"Cached thumbnail {os.path.basename(path)}")
+
+    def _store(self, path: str) -> None:
+        os.replace(path + ".tmp", path)
+        self._evict()
+
+    @staticmethod
+    def _touch(path: str) -> bool:
+        try:
+            os.utime(path)
+            return True
+        except FileNotFoundError:
+            return False
+
+    @staticmethod
+    def _link(path: str, destination: str) -> None:
+        if os.path.exists(destination):
+            os.remove(destination)
+        try:
+            os.link(path, destination)
+        except OSError:
+            shutil.copyfile(path, destination)
+
+    def _evict(self) -> None:
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".jpg"):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name))
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+                total -= size
+            except FileNotFoundError:
+                pass
+
+
+thumbnail_cache = ThumbnailCache(
+    directory=os.path.join(Config.DOWNLOAD_LOCATION, ".thumbnails"),
+    max_bytes=Config.THUMBNAIL_CACHE_SIZE
+)
\ No newline at end of file
@@ -0,0 +1,109 @@
+import logging
+import hashlib
+from typing import Optional
+from pyrogram.types import Message
+from helper_funcs.probe_cache import cache_key
+from database.access import clinton
+
+logging.basicConfig(level=logging.DEBUG,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def upload_key(
+    url: str,
+    tg_send_type: str,
+    youtube_dl_format: str,
+    youtube_dl_ext: str,
+    file_name: str,
+    version: Optional[str] = None,
+    username: Optional[str] = None,
+    password: Optional[str] = None,
+    thumbnail: Optional[str] = None
+) -> str:
+    """Returns the key of an upload in the cache.
+
+    Two requests share a key only if they would produce the same Telegram
+    message: the same normalized URL and credentials, format, send type
+    and file name, the same custom thumbnail and, for direct links, the
+    same ETag or Last-Modified version of the file.
+    """
+    parts = [
+        cache_key(url, username, password), tg_send_type, youtube_dl_format,
+        youtube_dl_ext, file_name, version or "", thumbnail or ""
+    ]
+    return hashlib.sha256("|".join(parts).encode("utf8")).hexdigest()
+
+
+def media_file_id(message: Optional[Message]) -> Optional[str]:
+    """Returns the file_id of the media in a sent message."""
+    if message is None:
+        return None
+    for media in (message.document, message.video, message.audio, message.video_note):
+        if media is not None:
+            return media.file_id
+    return None
+
+
+class UploadCache:
+    """Remembers the file_id Telegram returned for an upload.
+
+    A repeated request is answered with ``send_cached_media``, which copies
+    the file on Telegram's side in milliseconds instead of downloading and
+    uploading it again. Entries are stored in the UPLOADS collection.
+    """
+
+    async def send(
+        self,
+        bot,
+        key: str,
+        chat_id: int,
+        caption: str,
+        reply_to_message_id: int,
+        parse_mode: Optional[str] = None
+    ) -> Optional[Message]:
+        """Re-sends a cached upload; returns None on a miss."""
+        file_id = await clinton.get_upload(key)
+        if file_id is None:
+            return None
+        message = await self.resend(bot, file_id, chat_id, caption, reply_to_message_id, parse_mode)
+        if message is None:
+            await clinton.delete_upload(key)
+        return message
+
+    async def resend(
+        self,
+        bot,
+        file_id: str,
+        chat_id: int,
+        caption: str,
+        reply_to_message_id: int,
+        parse_mode: Optional[str] = None
+    ) -> Optional[Message]:
+        """Sends a file that is already on Telegram; returns None if that fails."""
+        options = {}
+        # pyrogram reads an explicit None as "no formatting"
+        if parse_mode is not None:
+            options["parse_mode"] = parse_mode
+        try:
+            message = await bot.send_cached_media(
+                chat_id=chat_id,
+                file_id=file_id,
+                caption=caption,
+                reply_to_message_id=reply_to_message_id,
+                **options
+            )
+            logger.info(f"Re-sent cached file {file_id}")
+            return message
+        except Exception as e:
+            logger.error(f"Failed to re-send cached file {file_id}: {e}")
+            return None
+
+    async def set(self, key: str, message: Optional[Message]) -> None:
+        """Remembers the file of a message that was just uploaded."""
+        file_id = media_file_id(message)
+        if file_id is not None:
+            await clinton.set_upload(key, file_id)
+
+
+upload_cache = UploadCache()
\ No newline at end of file
@@ -0,0 +1,180 @@
+import logging
+import asyncio
+import inspect
+import math
+import os
+from typing import Optional, Dict, List, Callable, Awaitable, Union
+from pyrogram import raw
+from pyrogram.errors import FloodWait
+from pyrogram.session import Session
+from config import Config
+
+logging.basicConfig(level=logging.DEBUG,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+ProgressCallback = Callable[[int, int], Awaitable[None]]
+
+# Telegram requires every part except the last to be exactly this size
+PART_SIZE = 512 * 1024
+# files above this size must be uploaded as "big" files
+BIG_FILE_SIZE = 10 * 1024 * 1024
+# attempts per part before the whole upload is given up
+PART_RETRIES = 3
+
+
+async def save_part(send, file_id: int, index: int, total_parts: int, data: bytes, is_big: bool) -> None:
+    """Uploads one part, waiting out FloodWait and retrying other errors.
+
+    ``send`` is ``Client.send`` or the ``send`` of a dedicated media session.
+    """
+    if is_big:
+        request = raw.functions.upload.SaveBigFilePart(
+            file_id=file_id,
+            file_part=index,
+            file_total_parts=total_parts,
+            bytes=data
+        )
+    else:
+        request = raw.functions.upload.SaveFilePart(
+            file_id=file_id,
+            file_part=index,
+            bytes=data
+        )
+    attempt = 0
+    while True:
+        try:
+            if not await send(request):
+                raise ValueError(f"Telegram refused part {index}")
+            return
+        except FloodWait as e:
+            logger.warning(f"FloodWait of {e.x}s while uploading part {index}")
+            await asyncio.sleep(e.x)
+        except Exception as e:
+            attempt += 1
+            if attempt >= PART_RETRIES:
+                raise
+            logger.warning(f"Retrying part {index} after error: {e}")
+            await asyncio.sleep(attempt)
+
+
+def input_file(file_id: int, total_size: int, file_name: str) -> Union[raw.types.InputFile, raw.types.InputFileBig]:
+    """Returns what a send request needs to refer to a file uploaded in parts."""
+    total_parts = max(1, math.ceil(total_size / PART_SIZE))
+    if total_size > BIG_FILE_SIZE:
+        return raw.types.InputFileBig(id=file_id, parts=total_parts, name=file_name)
+    return raw.types.InputFile(id=file_id, parts=total_parts, name=file_name, md5_checksum="")
+
+
+class UploadEngine:
+    """Uploads files from disk over several parallel MTProto sessions.
+
+    Every client gets Config.UPLOAD_SESSIONS media sessions to its home DC,
+    started on first use and kept for later uploads. Config.UPLOAD_WORKERS
+    workers share them round-robin. Each worker reads its next 512 KB part
+    with a positional read in an executor, so no part is read twice and disk
+    I/O never blocks the loop, and saves it with SaveBigFilePart (or
+    SaveFilePart for small files). A failing part is retried on its own before the upload is
+    given up.
+    """
+
+    def __init__(self, sessions: int, workers: int):
+        self.sessions = sessions
+        self.workers = workers
+        self._sessions: Dict[int, List[Session]] = {}
+        self._lock = asyncio.Lock()
+
+    async def get_sessions(self, bot) -> List[Session]:
+        """Returns the media sessions of a client, starting them on first use."""
+        async with self._lock:
+            sessions = self._sessions.get(id(bot))
+            if sessions is None:
+                options = {"is_media": True}
+                if "test_mode" in inspect.signature(Session.__init__).parameters:
+                    options["test_mode"] = await bot.storage.test_mode()
+                dc_id = await bot.storage.dc_id()
+                auth_key = await bot.storage.auth_key()
+                sessions = []
+                for _ in range(self.sessions):
+                    session = Session(bot, dc_id, auth_key, **options)
+                    await session.start()
+                    sessions.append(session)
+                self._sessions[id(bot)] = sessions
+                logger.info(f"Started {len(sessions)} upload sessions on DC{dc_id}")
+            return sessions
+
+    async def stop(self) -> None:
+        """Stops the media sessions of every client."""
+        async with self._lock:
+            sessions = [session for client_sessions in self._sessions.values() for session in client_sessions]
+            self._sessions.clear()
+        for session in sessions:
+            try:
+                await session.stop()
+            except Exception as e:
+                logger.error(f"Failed to stop upload session: {e}")
+        if sessions:
+            logger.info(f"Stopped {len(sessions)} upload sessions")
+
+    async def upload(
+        self,
+        bot,
+        path: str,
+        file_name: Optional[str] = None,
+        progress: Optional[ProgressCallback] = None
+    ) -> Union[raw.types.InputFile, raw.types.InputFileBig]:
+        """Uploads a file and returns the InputFile or InputFileBig to send it with.
+
+        Args:
+            bot: The pyrogram client whose account owns the upload.
+            path (str): The file to upload.
+            file_name (str): The name Telegram should store; the base name of path if missing.
+            progress (ProgressCallback): Awaited with (uploaded, total) after each part.
+        """
+        total_size = os.path.getsize(path)
+        if total_size == 0:
+            raise ValueError(f"Cannot upload empty file {path}")
+        file_name = file_name or os.path.basename(path)
+        total_parts = math.ceil(total_size / PART_SIZE)
+        is_big = total_size > BIG_FILE_SIZE
+        file_id = bot.rnd_id()
+        sessions = await self.get_sessions(bot)
+        loop = asyncio.get_running_loop()
+        next_part = 0
+        uploaded = 0
+
+        with open(path, "rb") as f:
+
+            async def worker(session: Session):
+                nonlocal next_part, uploaded
+                while next_part < total_parts:
+                    index = next_part
+                    next_part += 1
+                    offset = index * PART_SIZE
+                    part = await loop.run_in_executor(None, os.pread, f.fileno(), PART_SIZE, offset)
+                    await save_part(session.send, file_id, index, total_parts, part, is_big)
+                    uploaded += len(part)
+                    if progress is not None:
+                        try:
+                            await progress(uploaded, total_size)
+                        except Exception as e:
+                            logger.error(f"Progress callback failed: {e}")
+
+            tasks = [
+                asyncio.create_task(worker(sessions[index % len(sessions)]))
+                for index in range(min(self.workers, total_parts))
+            ]
+            try:
+                await asyncio.gather(*tasks)
+            finally:
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+
+        return input_file(file_id, total_size, file_name)
+
+
+upload_engine = UploadEngine(
+    sessions=Config.UPLOAD_SESSIONS,
+    workers=Config.UPLOAD_WORKERS
+)
\ No newline at end of file
@@ -0,0 +1,232 @@
+import logging
+import asyncio
+import multiprocessing
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional, Dict, Any, Tuple, Callable, Awaitable
+from config import Config
+
+logging.basicConfig(level=logging.DEBUG,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+ProgressCallback = Callable[[int, int], Awaitable[None]]
+
+# seconds between progress polls of a running download
+PROGRESS_POLL_INTERVAL = 3
+# seconds between progress reports sent from a worker to the shared dict
+PROGRESS_REPORT_INTERVAL = 1
+
+# warm credential-less YoutubeDL instances of this worker process, keyed by proxy
+_probe_clients: Dict[str, Any] = {}
+
+
+def _init_worker() -> None:
+    """Imports yt-dlp and its extractors once, when the worker starts."""
+    import yt_dlp
+    from yt_dlp.extractor import gen_extractor_classes
+    gen_extractor_classes()
+    logger.info(f"yt-dlp {yt_dlp.version.__version__} loaded in worker")
+
+
+def _base_options(proxy: str, username: Optional[str], password: Optional[str]) -> Dict[str, Any]:
+    # noprogress too: in library mode quiet alone still prints the progress bar
+    options = {"quiet": True, "no_warnings": True, "noprogress": True}
+    if proxy:
+        options["proxy"] = proxy
+    if username is not None:
+        options["username"] = username
+    if password is not None:
+        options["password"] = password
+    return options
+
+
+def _probe(url: str, proxy: str, username: Optional[str], password: Optional[str]) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    """Worker side of ``probe``; the equivalent of ``yt-dlp -j``."""
+    import yt_dlp
+    # instances holding credentials are never kept, so passwords do not outlive the request
+    anonymous = username is None and password is None
+    ydl = _probe_clients.get(proxy) if anonymous else None
+    if ydl is None:
+        options = _base_options(proxy, username, password)
+        options["youtube_include_dash_manifest"] = False
+        ydl = yt_dlp.YoutubeDL(options)
+        if anonymous:
+            _probe_clients[proxy] = ydl
+    try:
+        info = ydl.extract_info(url, download=False)
+        return ydl.sanitize_info(info), None
+    except yt_dlp.utils.DownloadError as e:
+        return None, str(e)
+    except Exception as e:
+        return None, f"{type(e).__name__}: {e}"
+
+
+def _download(
+    url: str,
+    output: str,
+    tg_send_type: str,
+    youtube_dl_format: str,
+    youtube_dl_ext: str,
+    proxy: str,
+    username: Optional[str],
+    password: Optional[str],
+    progress,
+    job_id: str
+) -> Tuple[Optional[str], Optional[str]]:
+    """Worker side of ``download``; mirrors the old yt-dlp command line."""
+    import yt_dlp
+    options = _base_options(proxy, username, password)
+    options.update({
+        "continuedl": True,
+        "max_filesize": Config.TG_MAX_FILE_SIZE,
+        "outtmpl": output
+    })
+    if tg_send_type == "audio":
+        options.update({
+            "format": "bestaudio/best",
+            "prefer_ffmpeg": True,
+            "postprocessors": [{
+                "key": "FFmpegExtractAudio",
+                "preferredcodec": youtube_dl_ext,
+                "preferredquality": youtube_dl_format
+            }]
+        })
+    else:
+        minus_f_format = youtube_dl_format
+        if "youtu" in url:
+            minus_f_format = youtube_dl_format + "+bestaudio"
+        options.update({
+            "format": minus_f_format,
+            "hls_prefer_native": False,
+            "writesubtitles": True,
+            "postprocessors": [{"key": "FFmpegEmbedSubtitle", "already_have_subtitle": False}]
+        })
+
+    last_report = 0.0
+
+    def hook(status):
+        # every report is an IPC round trip to the manager, so send them sparingly
+        nonlocal last_report
+        now = time.time()
+        if status.get("status") == "downloading" and now - last_report < PROGRESS_REPORT_INTERVAL:
+            return
+        last_report = now
+        total = status.get("total_bytes") or status.get("total_bytes_estimate") or 0
+        progress[job_id] = (status.get("downloaded_bytes") or 0, int(total))
+
+    options["progress_hooks"] = [hook]
+    try:
+        with yt_dlp.YoutubeDL(options) as ydl:
+            info = ydl.extract_info(url, download=True)
+        downloads = info.get("requested_downloads") or [{}]
+        return downloads[-1].get("filepath") or output, None
+    except yt_dlp.utils.DownloadError as e:
+        return None, str(e)
+    except Exception as e:
+        return None, f"{type(e).__name__}: {e}"
+
+
+class YtdlEngine:
+    """Runs yt-dlp through its library API in pools of warm worker processes.
+
+    Each worker imports yt-dlp once and keeps its YoutubeDL instances, so
+    probes and downloads no longer pay for a new interpreter and for
+    loading every extractor. Probes and downloads have separate pools, so
+    long downloads never hold up the probe of a new link. Downloads report
+    progress back through a shared dict that is polled from the event loop.
+    A pool whose worker died is replaced and the call is retried once.
+    """
+
+    def __init__(self, probe_workers: int, download_workers: int):
+        self.workers = {"probe": probe_workers, "download": download_workers}
+        self._pools: Dict[str, ProcessPoolExecutor] = {}
+        self._manager = None
+        self._progress = None
+
+    def _pool(self, kind: str) -> ProcessPoolExecutor:
+        context = multiprocessing.get_context("spawn")
+        if self._manager is None:
+            self._manager = context.Manager()
+            self._progress = self._manager.dict()
+        pool = self._pools.get(kind)
+        if pool is None:
+            pool = ProcessPoolExecutor(max_workers=self.workers[kind], mp_context=context, initializer=_init_worker)
+            self._pools[kind] = pool
+        return pool
+
+    async def _call(self, kind: str, fn, *args):
+        loop = asyncio.get_running_loop()
+        for attempt in range(2):
+            pool = self._pool(kind)
+            try:
+                return await loop.run_in_executor(pool, fn, *args)
+            except BrokenProcessPool:
+                logger.error(f"yt-dlp {kind} pool broke, starting a new one")
+                if self._pools.get(kind) is pool:
+                    del self._pools[kind]
+                    pool.shutdown(wait=False)
+        return None, "The yt-dlp worker crashed, please try again."
+
+    async def probe(
+        self,
+        url: str,
+        username: Optional[str] = None,
+        password: Optional[str] = None
+    ) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+        """Extracts the metadata of a URL without downloading it.
+
+        Returns:
+            Tuple: (info, None) on success, (None, error message) on failure.
+        """
+        return await self._call("probe", _probe, url, Config.HTTP_PROXY, username, password)
+
+    async def download(
+        self,
+        url: str,
+        output: str,
+        tg_send_type: str,
+        youtube_dl_format: str,
+        youtube_dl_ext: str,
+        username: Optional[str] = None,
+        password: Optional[str] = None,
+        progress: Optional[ProgressCallback] = None
+    ) -> Tuple[Optional[str], Optional[str]]:
+        """Downloads a URL in the chosen format.
+
+        Returns:
+            Tuple: (file path, None) on success, (None, error message) on failure.
+        """
+        loop = asyncio.get_running_loop()
+        self._pool("download")
+        job_id = uuid.uuid4().hex
+        future = asyncio.ensure_future(self._call(
+            "download", _download,
+            url, output, tg_send_type, youtube_dl_format, youtube_dl_ext,
+            Config.HTTP_PROXY, username, password, self._progress, job_id
+        ))
+        try:
+            while not future.done():
+                await asyncio.wait([future], timeout=PROGRESS_POLL_INTERVAL)
+                status = await loop.run_in_executor(None, self._progress.get, job_id)
+                if progress is not None and status is not None:
+                    try:
+                        await progress(*status)
+                    except Exception as e:
+                        logger.error(f"Progress callback failed: {e}")
+            return await future
+        finally:
+            if not future.done():
+                future.cancel()
+            try:
+                await loop.run_in_executor(None, self._progress.pop, job_id, None)
+            except Exception:
+                pass
+
+
+ytdl_engine = YtdlEngine(
+    probe_workers=Config.YTDL_WORKERS,
+    download_workers=Config.MAX_CONCURRENT_DOWNLOADS
+)
\ No newline at end of file
@@ -1,106 +1,326 @@
-import traceback, datetime, asyncio, string, random, time
+import traceback, datetime, asyncio, string, random, time, os, logging
+from collections import deque
 import aiofiles, aiofiles.os
 from database.access import clinton
+from database.user_registry import user_registry
 from pyrogram import filters
 from pyrogram import Client as Clinton
 from pyrogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from pyrogram.errors import FloodWait, InputUserDeactivated, UserIsBlocked, PeerIdInvalid
 
 from config import Config
+logger = logging.getLogger(__name__)
 broadcast_ids = {}
 
-async def send_msg(user_id, message):
-    try:
-        await message.copy(chat_id=user_id)
-        return 200, None
-    except FloodWait as e:
-        await asyncio.sleep(e.x)
-        return await send_msg(user_id, message)
-    except InputUserDeactivated:
-        return 400, f"{user_id} : deactivated\n"
-    except UserIsBlocked:
-        return 400, f"{user_id} : blocked the bot\n"
-    except PeerIdInvalid:
-        return 400, f"{user_id} : user id invalid\n"
-    except Exception as e:
-        return 500, f"{user_id} : {traceback.format_exc()}\n"
+
+class TokenBucket:
+    """Spaces out sends to stay under Telegram's broadcast rate limit.
+
+    The bucket refills at ``rate`` tokens per second. A FloodWait pauses
+    every worker for the requested time and halves the rate; each success
+    afterwards lets it creep back up towards the configured maximum.
+    """
+
+    def __init__(self, rate: float, min_rate: float = 1.0):
+        self.max_rate = rate
+        self.rate = rate
+        self.min_rate = min_rate
+        self.tokens = rate
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    await asyncio.sleep(self.paused_until - now)
+                    continue
+                self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def flood_wait(self, seconds: float):
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        self.rate = max(self.min_rate, self.rate / 2)
+        self.tokens = 0
+
+    def success(self):
+        if self.rate < self.max_rate:
+            self.rate = min(self.max_rate, self.rate * 1.01)
+
+
+async def send_msg(user_id, message, bucket):
+    while True:
+        await bucket.acquire()
+        try:
+            await message.copy(chat_id=user_id)
+            bucket.success()
+            return 200, None
+        except FloodWait as e:
+            bucket.flood_wait(e.x)
+        except InputUserDeactivated:
+            return 400, f"{user_id} : deactivated\n"
+        except UserIsBlocked:
+            return 400, f"{user_id} : blocked the bot\n"
+        except PeerIdInvalid:
+            return 400, f"{user_id} : user id invalid\n"
+        except Exception as e:
+            return 500, f"{user_id} : {traceback.format_exc()}\n"
         
 
-@Clinton.on_message(filters.private & filters.command('broadcast') & filters.reply)
-async def broadcast_(c, m):
-    if m.from_user.id != Config.OWNER_ID:
+class Checkpoint:
+    """Tracks the highest user _id below which every user has been handled.
+
+    Workers finish out of order, so the checkpoint only moves past an _id
+    once every earlier _id handed out has finished too. After a crash, at
+    most the users that were in flight are sent to again.
+    """
+
+    def __init__(self, last_id):
+        self.last_id = last_id
+        self.in_flight = deque()
+        self.finished = set()
+
+    def start(self, _id):
+        self.in_flight.append(_id)
+
+    def finish(self, _id):
+        self.finished.add(_id)
+        while self.in_flight and self.in_flight[0] in self.finished:
+            self.last_id = self.in_flight.popleft()
+            self.finished.discard(self.last_id)
+
+
+async def run_broadcast(c, m, job):
+    broadcast_id = job['_id']
+    try:
+        broadcast_msg = await c.get_messages(job['chat_id'], job['message_id'])
+    except Exception as e:
+        await m.reply_text(text=f"Broadcast message of `{broadcast_id}` is not available: {e}", quote=True)
         return
-    all_users = await clinton.get_all_users()
-    
-    broadcast_msg = m.reply_to_message
-    
-    while True:
-        broadcast_id = ''.join([random.choice(string.ascii_letters) for i in range(3)])
-        if not broadcast_ids.get(broadcast_id):
-            break
+    all_users = await clinton.get_users_after(job.get('last_id'))
     
     out = await m.reply_text(
-        text = f"Broadcast initiated! This will send a copy of your message to every user who has started this bot. You will be notified with log file when all the users are notified."
+        text = f"Broadcast `{broadcast_id}` running! This will send a copy of your message to every user who has started this bot. You will be notified with log file when all the users are notified.\n\nUse /broadcast_status to follow it."
     )
     start_time = time.time()
-    total_users = await clinton.total_users_count()
-    done = 0
-    failed = 0
-    success = 0
+    total_users = job['total']
+    done = job['done']
+    failed = job['failed']
+    success = job['success']
     
     broadcast_ids[broadcast_id] = dict(
         total = total_users,
         current = done,
         failed = failed,
-        success = success
+        success = success,
+        started = start_time,
+        started_at_done = done
     )
     
-    async with aiofiles.open('broadcast.txt', 'w') as broadcast_log_file:
-        async for user in all_users:
-            if broadcast_ids.get(broadcast_id) is None:
-                break
-            
-            sts, msg = await send_msg(
-                user_id = int(user['id']),
-                message = broadcast_msg
-            )
-            if msg is not None:
-                await broadcast_log_file.write(msg)
-            
-            if sts == 200:
-                success += 1
-            else:
-                failed += 1
-            
-            if sts == 400:
-                await clinton.delete_user(user['id'])
-            
-            done += 1
-            broadcast_ids[broadcast_id].update(
-                    dict(
-                        current = done,
-                        failed = failed,
-                        success = success
-                    )
-                )
+    bucket = TokenBucket(Config.BROADCAST_RATE)
+    queue = asyncio.Queue(maxsize=Config.BROADCAST_WORKERS * 4)
+    checkpoint = Checkpoint(job.get('last_id'))
+    log_lines = []
+    failures = []
+    to_delete = []
+    log_file = f'broadcast_{broadcast_id}.txt'
+    
+    async with aiofiles.open(log_file, 'a') as broadcast_log_file:
+        
+        async def flush(force=False):
+            if not force and len(log_lines) < Config.BROADCAST_BATCH_SIZE and len(to_delete) < Config.BROADCAST_BATCH_SIZE:
+                return
+            lines, failed_users, ids = log_lines[:], failures[:], to_delete[:]
+            log_lines.clear()
+            failures.clear()
+            to_delete.clear()
+            try:
+                if lines:
+                    await broadcast_log_file.write(''.join(lines))
+                if failed_users:
+                    await clinton.log_broadcast_failures(broadcast_id, failed_users)
+                if ids:
+                    await clinton.delete_users(ids)
+                    user_registry.forget(ids)
+                await clinton.update_broadcast(broadcast_id, dict(
+                    last_id = checkpoint.last_id,
+                    done = done,
+                    failed = failed,
+                    success = success
+                ))
+            except Exception as e:
+                logger.error(f"Failed to save progress of broadcast {broadcast_id}: {e}")
+        
+        async def worker():
+            nonlocal done, failed, success
+            while True:
+                _id, user_id = await queue.get()
+                try:
+                    sts, msg = await send_msg(user_id, broadcast_msg, bucket)
+                    if msg is not None:
+                        log_lines.append(msg)
+                        failures.append(dict(user_id = user_id, status = sts, reason = msg.strip()))
+                    if sts == 200:
+                        success += 1
+                    else:
+                        failed += 1
+                    if sts == 400:
+                        to_delete.append(user_id)
+                    done += 1
+                    checkpoint.finish(_id)
+                    if broadcast_ids.get(broadcast_id):
+                        broadcast_ids[broadcast_id].update(
+                            dict(
+                                current = done,
+                                failed = failed,
+                                success = success
+                            )
+                        )
+                    await flush()
+                except Exception as e:
+                    logger.error(f"Broadcast {broadcast_id} failed on user {user_id}: {e}")
+                finally:
+                    queue.task_done()
+        
+        async def watched(coro):
+            # a full queue, or one left with items, waits forever once every worker is gone
+            op = asyncio.ensure_future(coro)
+            try:
+                while not op.done():
+                    alive = [task for task in workers if not task.done()]
+                    if not alive:
+                        raise RuntimeError("every broadcast worker stopped")
+                    await asyncio.wait([op, *alive], return_when=asyncio.FIRST_COMPLETED)
+                return op.result()
+            finally:
+                op.cancel()
+        
+        async def checkpointer():
+            while True:
+                await asyncio.sleep(Config.BROADCAST_CHECKPOINT_INTERVAL)
+                await flush(force=True)
+        
+        workers = [asyncio.create_task(worker()) for _ in range(Config.BROADCAST_WORKERS)]
+        saver = asyncio.create_task(checkpointer())
+        cancelled = False
+        stopped = False
+        try:
+            async for user in all_users:
+                if broadcast_ids.get(broadcast_id) is None:
+                    cancelled = True
+                    break
+                checkpoint.start(user['_id'])
+                await watched(queue.put((user['_id'], int(user['id']))))
+            await watched(queue.join())
+        except RuntimeError as e:
+            logger.error(f"Broadcast {broadcast_id} stopped: {e}")
+            stopped = True
+        finally:
+            saver.cancel()
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(saver, *workers, return_exceptions=True)
+            await flush(force=True)
     if broadcast_ids.get(broadcast_id):
         broadcast_ids.pop(broadcast_id)
+    if stopped:
+        # the job stays running so it can be resumed from its checkpoint
+        await out.edit_text(
+            text=f"Broadcast `{broadcast_id}` stopped at {done}/{total_users}, its workers failed.\nUse /broadcast_resume to continue it."
+        )
+        return
+    await clinton.update_broadcast(broadcast_id, dict(status = 'cancelled' if cancelled else 'done'))
     completed_in = datetime.timedelta(seconds=int(time.time()-start_time))
     
     await asyncio.sleep(3)
     
     await out.delete()
     
-    if failed == 0:
+    if failed == 0 or not os.path.getsize(log_file):
         await m.reply_text(
             text=f"broadcast completed in `{completed_in}`\n\nTotal users {total_users}.\nTotal done {done}, {success} success and {failed} failed.",
             quote=True
         )
     else:
         await m.reply_document(
-            document='broadcast.txt',
+            document=log_file,
             caption=f"broadcast completed in `{completed_in}`\n\nTotal users {total_users}.\nTotal done {done}, {success} success and {failed} failed.",
             quote=True
         )
     
-    await aiofiles.os.remove('broadcast.txt')
\ No newline at end of file
+    await aiofiles.os.remove(log_file)
+
+
+@Clinton.on_message(filters.private & filters.command('broadcast') & filters.reply)
+async def broadcast_(c, m):
+    if m.from_user.id != Config.OWNER_ID:
+        return
+    
+    while True:
+        broadcast_id = ''.join([random.choice(string.ascii_letters) for i in range(3)])
+        if not broadcast_ids.get(broadcast_id) and not await clinton.get_broadcast(broadcast_id):
+            break
+    
+    job = dict(
+        _id = broadcast_id,
+        chat_id = m.chat.id,
+        message_id = m.reply_to_message.message_id,
+        status = 'running',
+        last_id = None,
+        total = await clinton.total_users_count(),
+        done = 0,
+        failed = 0,
+        success = 0
+    )
+    await clinton.create_broadcast(job)
+    await run_broadcast(c, m, job)
+
+
+@Clinton.on_message(filters.private & filters.command('broadcast_resume'))
+async def broadcast_resume(c, m):
+    if m.from_user.id != Config.OWNER_ID:
+        return
+    if len(m.command) > 1:
+        job = await clinton.get_broadcast(m.command[1])
+    else:
+        job = await clinton.get_unfinished_broadcast()
+    if job is None or job['status'] != 'running':
+        await m.reply_text(text="No unfinished broadcast found.", quote=True)
+        return
+    if broadcast_ids.get(job['_id']):
+        await m.reply_text(text=f"Broadcast `{job['_id']}` is already running.", quote=True)
+        return
+    await run_broadcast(c, m, job)
+
+
+@Clinton.on_message(filters.private & filters.command('broadcast_status'))
+async def broadcast_status(c, m):
+    if m.from_user.id != Config.OWNER_ID:
+        return
+    if not broadcast_ids:
+        job = await clinton.get_unfinished_broadcast()
+        if job is None:
+            await m.reply_text(text="No broadcast is running.", quote=True)
+        else:
+            await m.reply_text(
+                text=f"Broadcast `{job['_id']}` is paused at {job['done']}/{job['total']}.\nUse /broadcast_resume to continue it.",
+                quote=True
+            )
+        return
+    lines = []
+    for broadcast_id, sts in broadcast_ids.items():
+        elapsed = time.time() - sts['started']
+        rate = (sts['current'] - sts['started_at_done']) / elapsed if elapsed > 0 else 0
+        remaining = max(0, sts['total'] - sts['current'])
+        eta = datetime.timedelta(seconds=int(remaining / rate)) if rate > 0 else "unknown"
+        lines.append(
+            f"`{broadcast_id}`: {sts['current']}/{sts['total']} done, {sts['success']} success, {sts['failed']} failed.\n"
+            f"Speed: {rate:.1f} msg/s, ETA: {eta}"
+        )
+    await m.reply_text(text="\n\n".join(lines), quote=True)
\ No newline at end of file
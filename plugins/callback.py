@@ -2,6 +2,9 @@ from pyrogram import filters
 from pyrogram import Client as Clinton
 from plugins.youtube_dl_button import youtube_dl_call_back
 from plugins.dl_button import ddl_call_back
+from translation import Translation
+from helper_funcs.scheduler import job_scheduler
+from helper_funcs.display_progress import progress_service
 
 @Clinton.on_callback_query(filters.regex('^X0$'))
 async def delt(bot, update):
@@ -13,8 +16,22 @@ async def button(bot, update):
 
     cb_data = update.data
     if "|" in cb_data:
-        await youtube_dl_call_back(bot, update)
+        job = youtube_dl_call_back
     elif "=" in cb_data:
-        await ddl_call_back(bot, update)
+        job = ddl_call_back
     else:
-        await update.answer("This button has no functionality associated with it")
\ No newline at end of file
+        await update.answer("This button has no functionality associated with it")
+        return
+
+    chat_id = update.message.chat.id
+    message_id = update.message.message_id
+
+    async def on_queued(position):
+        progress_service.publish(bot, chat_id, message_id, Translation.QUEUED.format(position))
+
+    async def run():
+        # a queue position not sent yet must not overwrite the job's own status
+        progress_service.clear(chat_id, message_id)
+        return await job(bot, update)
+
+    job_scheduler.submit(update.from_user.id, run, on_queued=on_queued)
\ No newline at end of file
@@ -12,30 +12,30 @@ from config import Config
 # the Strings used for this "thing"
 from translation import Translation
 from pyrogram import Client as Clinton
-from database.access import clinton
-from hachoir.metadata import extractMetadata
-from hachoir.parser import createParser
+from database.user_settings import user_settings
 logging.getLogger("pyrogram").setLevel(logging.WARNING)
 from pyrogram import filters
 from database.adduser import AddUser
 from helper_funcs.help_Nekmo_ffmpeg import take_screen_shot
+from helper_funcs.thumbnail_cache import thumbnail_cache
+from helper_funcs.media_info import media_probe
 
 @Clinton.on_message(filters.private & filters.photo)
 async def save_photo(bot, update):
     await AddUser(bot, update)
-    await clinton.set_thumbnail(update.from_user.id, thumbnail=update.photo.file_id)
+    await user_settings.set_thumbnail(update.from_user.id, update.photo.file_id, update.photo.file_unique_id)
     await bot.send_message(chat_id=update.chat.id, text=Translation.SAVED_CUSTOM_THUMB_NAIL, reply_to_message_id=update.message_id)
 
 @Clinton.on_message(filters.private & filters.command("delthumbnail"))
 async def delthumbnail(bot, update):
     await AddUser(bot, update)
-    await clinton.set_thumbnail(update.from_user.id, thumbnail=None)
+    await user_settings.set_thumbnail(update.from_user.id, None)
     await bot.send_message(chat_id=update.chat.id, text=Translation.DEL_ETED_CUSTOM_THUMB_NAIL, reply_to_message_id=update.message_id)
 
 @Clinton.on_message(filters.private & filters.command("viewthumbnail") )
 async def viewthumbnail(bot, update):
     await AddUser(bot, update)
-    thumbnail = await clinton.get_thumbnail(update.from_user.id)
+    thumbnail = (await user_settings.get(update.from_user.id)).thumbnail
     if thumbnail is not None:
         await bot.send_photo(
         chat_id=update.chat.id,
@@ -45,33 +45,27 @@ async def viewthumbnail(bot, update):
     else:
         await update.reply_text(text=f"No Thumbnail found 🤒")
 
+def thumb_path(update):
+    return Config.DOWNLOAD_LOCATION + "/" + str(update.from_user.id) + "_" + str(update.message.message_id) + ".jpg"
+
 async def Gthumb01(bot, update):
-    thumb_image_path = Config.DOWNLOAD_LOCATION + "/" + str(update.from_user.id) + ".jpg"
-    db_thumbnail = await clinton.get_thumbnail(update.from_user.id)
-    if db_thumbnail is not None:
+    settings = await user_settings.get(update.from_user.id)
+    if settings.thumbnail is not None:
         try:
-            thumbnail = await bot.download_media(message=db_thumbnail, file_name=thumb_image_path)
-            Image.open(thumbnail).convert("RGB").save(thumbnail)
-            img = Image.open(thumbnail)
-            img.resize((100, 100))
-            img.save(thumbnail, "JPEG")
-            return thumbnail
+            cached = await thumbnail_cache.get(bot, settings.thumbnail, settings.thumbnail_unique_id)
+            return await thumbnail_cache.copy_to(cached, thumb_path(update))
         except Exception as e:
              logger.error(f"Failed to generate thumbnail: {e}")
              return None
-        finally:
-             if os.path.exists(thumb_image_path):
-                os.remove(thumb_image_path)
     else:
         return None
 
 async def Gthumb02(bot, update, duration, download_directory):
-    thumb_image_path = Config.DOWNLOAD_LOCATION + "/" + str(update.from_user.id) + ".jpg"
-    db_thumbnail = await clinton.get_thumbnail(update.from_user.id)
-    if db_thumbnail is not None:
+    settings = await user_settings.get(update.from_user.id)
+    if settings.thumbnail is not None:
         try:
-            thumbnail = await bot.download_media(message=db_thumbnail, file_name=thumb_image_path)
-            return thumbnail
+            cached = await thumbnail_cache.get(bot, settings.thumbnail, settings.thumbnail_unique_id)
+            return await thumbnail_cache.copy_to(cached, thumb_path(update))
         except Exception as e:
             logger.error(f"Failed to download thumbnail: {e}")
             return await take_screen_shot(download_directory, os.path.dirname(download_directory), random.randint(0, duration - 1))
@@ -80,48 +74,13 @@ async def Gthumb02(bot, update, duration, download_directory):
 
 
 async def Mdata01(download_directory):
-          width = 0
-          height = 0
-          duration = 0
-          try:
-              metadata = extractMetadata(createParser(download_directory))
-              if metadata is not None:
-                  if metadata.has("duration"):
-                      duration = metadata.get('duration').seconds
-                  if metadata.has("width"):
-                      width = metadata.get("width")
-                  if metadata.has("height"):
-                      height = metadata.get("height")
-          except Exception as e:
-               logger.error(f"Failed to get metadata for {download_directory}: {e}")
-
-          return width, height, duration
+    info = await media_probe.probe(download_directory)
+    return info.width, info.height, info.duration
 
 async def Mdata02(download_directory):
-
-          width = 0
-          duration = 0
-          try:
-              metadata = extractMetadata(createParser(download_directory))
-              if metadata is not None:
-                  if metadata.has("duration"):
-                      duration = metadata.get('duration').seconds
-                  if metadata.has("width"):
-                      width = metadata.get("width")
-          except Exception as e:
-                logger.error(f"Failed to get metadata for {download_directory}: {e}")
-
-          return width, duration
+    info = await media_probe.probe(download_directory)
+    return info.width, info.duration
 
 async def Mdata03(download_directory):
-
-          duration = 0
-          try:
-              metadata = extractMetadata(createParser(download_directory))
-              if metadata is not None:
-                  if metadata.has("duration"):
-                      duration = metadata.get('duration').seconds
-          except Exception as e:
-              logger.error(f"Failed to get metadata for {download_directory}: {e}")
-
-          return duration
\ No newline at end of file
+    info = await media_probe.probe(download_directory)
+    return info.duration
\ No newline at end of file
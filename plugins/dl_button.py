@@ -16,7 +16,17 @@ from config import Config
 from translation import Translation
 from plugins.custom_thumbnail import *
 logging.getLogger("pyrogram").setLevel(logging.WARNING)
-from helper_funcs.display_progress import progress_for_pyrogram, humanbytes, TimeFormatter
+from helper_funcs.display_progress import progress_for_pyrogram, progress_service, humanbytes, TimeFormatter
+from helper_funcs.direct_download import download_file, load_journal, probe_url, stream_parts
+from helper_funcs.help_uploadbot import get_session
+from helper_funcs.part_upload import PART_SIZE, upload_stream, send_uploaded_document
+from helper_funcs.client_pool import client_pool
+from helper_funcs.pipeline import job_pipeline
+from helper_funcs.disk_manager import disk_manager
+from helper_funcs.upload_cache import upload_cache, upload_key, media_file_id
+from helper_funcs.single_flight import in_flight
+from helper_funcs.scheduler import job_scheduler
+from database.user_settings import user_settings
 from hachoir.metadata import extractMetadata
 from hachoir.parser import createParser
 # https://stackoverflow.com/a/37631799/4723940
@@ -76,8 +86,13 @@ async def ddl_call_back(bot, update):
     if not os.path.isdir(tmp_directory_for_each_user):
         os.makedirs(tmp_directory_for_each_user)
     download_directory = tmp_directory_for_each_user + "/" + custom_file_name
-    command_to_exec = []
-    async with aiohttp.ClientSession() as session:
+    end_one = None
+    thumb_image_path = None
+    width = height = duration = 0
+
+    async def download():
+        nonlocal download_directory, end_one
+        session = get_session()
         c_time = time.time()
         try:
             download_success = await download_coroutine(
@@ -87,7 +102,8 @@ async def ddl_call_back(bot, update):
                 download_directory,
                 update.message.chat.id,
                 update.message.message_id,
-                c_time
+                c_time,
+                info
             )
         except asyncio.TimeoutError:
             await bot.edit_message_text(
@@ -95,14 +111,22 @@ async def ddl_call_back(bot, update):
                 chat_id=update.message.chat.id,
                 message_id=update.message.message_id
             )
+            # the journal lets a retry resume the partial file
+            if load_journal(download_directory) is not None:
+                reservation.disown(download_directory)
+            return False
+        if not (download_success and os.path.exists(download_directory)):
+            await bot.edit_message_text(
+                text=Translation.NO_VOID_FORMAT_FOUND.format("Incorrect Link"),
+                chat_id=update.message.chat.id,
+                message_id=update.message.message_id,
+                disable_web_page_preview=True
+            )
+            # keep the partial file while its journal allows resuming it
+            if load_journal(download_directory) is not None:
+                reservation.disown(download_directory)
             return False
-    if download_success and os.path.exists(download_directory):
         end_one = datetime.now()
-        await bot.edit_message_text(
-            text=Translation.UPLOAD_START,
-            chat_id=update.message.chat.id,
-            message_id=update.message.message_id
-        )
         file_size = Config.TG_MAX_FILE_SIZE + 1
         try:
             file_size = os.stat(download_directory).st_size
@@ -110,176 +134,325 @@ async def ddl_call_back(bot, update):
             download_directory = os.path.splitext(download_directory)[0] + "." + "mkv"
             # https://stackoverflow.com/a/678242/4723940
             file_size = os.stat(download_directory).st_size
+        reservation.track(download_directory)
         if file_size > Config.TG_MAX_FILE_SIZE:
             await bot.edit_message_text(
                 chat_id=update.message.chat.id,
                 text=Translation.RCHD_TG_API_LIMIT,
                 message_id=update.message.message_id
             )
-        else:
-            # ref: message from @lazyDeveloper
-            start_time = time.time()
-            # try to upload file
-            try:
-                if tg_send_type == "audio":
-                    duration = await Mdata03(download_directory)
-                    thumb_image_path = await Gthumb01(bot, update)
-                    await bot.send_audio(
-                        chat_id=update.message.chat.id,
-                        audio=download_directory,
-                        caption=description,
-                        duration=duration,
-                        thumb=thumb_image_path,
-                        reply_to_message_id=update.message.reply_to_message.message_id,
-                        progress=progress_for_pyrogram,
-                        progress_args=(
-                            Translation.UPLOAD_START,
-                            update.message,
-                            start_time
-                        )
+            return False
+        return True
+
+    async def postprocess():
+        nonlocal thumb_image_path, width, height, duration
+        try:
+            if tg_send_type == "audio":
+                duration = await Mdata03(download_directory)
+                thumb_image_path = await Gthumb01(bot, update)
+            elif tg_send_type == "file":
+                thumb_image_path = await Gthumb01(bot, update)
+            elif tg_send_type == "vm":
+                width, duration = await Mdata02(download_directory)
+                thumb_image_path = await Gthumb02(bot, update, duration, download_directory)
+            elif tg_send_type == "video":
+                width, height, duration = await Mdata01(download_directory)
+                thumb_image_path = await Gthumb02(bot, update, duration, download_directory)
+        except Exception as e:
+            logger.error(f"Failed to prepare upload: {e}")
+        return True
+
+    async def upload():
+        await bot.edit_message_text(
+            text=Translation.UPLOAD_START,
+            chat_id=update.message.chat.id,
+            message_id=update.message.message_id
+        )
+        # ref: message from @lazyDeveloper
+        start_time = time.time()
+        sent = None
+
+        async def progress(current, total):
+            await progress_for_pyrogram(current, total, Translation.UPLOAD_START, update.message, start_time)
+
+        # try to upload file
+        try:
+            if Config.UPLOAD_SESSIONS:
+                sent = await client_pool.send_file(
+                    bot,
+                    update.message.chat.id,
+                    download_directory,
+                    tg_send_type,
+                    caption=description,
+                    duration=duration,
+                    width=width,
+                    height=height,
+                    thumb=thumb_image_path,
+                    reply_to_message_id=update.message.reply_to_message.message_id,
+                    progress=progress
+                )
+            elif tg_send_type == "audio":
+                sent = await bot.send_audio(
+                    chat_id=update.message.chat.id,
+                    audio=download_directory,
+                    caption=description,
+                    duration=duration,
+                    thumb=thumb_image_path,
+                    reply_to_message_id=update.message.reply_to_message.message_id,
+                    progress=progress_for_pyrogram,
+                    progress_args=(
+                        Translation.UPLOAD_START,
+                        update.message,
+                        start_time
                     )
-                elif tg_send_type == "file":
-                      thumb_image_path = await Gthumb01(bot, update)
-                      await bot.send_document(
-                        chat_id=update.message.chat.id,
-                        document=download_directory,
-                        thumb=thumb_image_path,
-                        caption=description,
-                        reply_to_message_id=update.message.reply_to_message.message_id,
-                        progress=progress_for_pyrogram,
-                        progress_args=(
-                            Translation.UPLOAD_START,
-                            update.message,
-                            start_time
-                        )
+                )
+            elif tg_send_type == "file":
+                sent = await bot.send_document(
+                    chat_id=update.message.chat.id,
+                    document=download_directory,
+                    thumb=thumb_image_path,
+                    caption=description,
+                    reply_to_message_id=update.message.reply_to_message.message_id,
+                    progress=progress_for_pyrogram,
+                    progress_args=(
+                        Translation.UPLOAD_START,
+                        update.message,
+                        start_time
                     )
-                elif tg_send_type == "vm":
-                     width, duration = await Mdata02(download_directory)
-                     thumb_image_path = await Gthumb02(bot, update, duration, download_directory)
-                     await bot.send_video_note(
-                        chat_id=update.message.chat.id,
-                        video_note=download_directory,
-                        duration=duration,
-                        length=width,
-                        thumb=thumb_image_path,
-                        reply_to_message_id=update.message.reply_to_message.message_id,
-                        progress=progress_for_pyrogram,
-                        progress_args=(
-                            Translation.UPLOAD_START,
-                            update.message,
-                            start_time
-                        )
+                )
+            elif tg_send_type == "vm":
+                sent = await bot.send_video_note(
+                    chat_id=update.message.chat.id,
+                    video_note=download_directory,
+                    duration=duration,
+                    length=width,
+                    thumb=thumb_image_path,
+                    reply_to_message_id=update.message.reply_to_message.message_id,
+                    progress=progress_for_pyrogram,
+                    progress_args=(
+                        Translation.UPLOAD_START,
+                        update.message,
+                        start_time
                     )
-                elif tg_send_type == "video":
-                     width, height, duration = await Mdata01(download_directory)
-                     thumb_image_path = await Gthumb02(bot, update, duration, download_directory)
-                     await bot.send_video(
-                        chat_id=update.message.chat.id,
-                        video=download_directory,
-                        caption=description,
-                        duration=duration,
-                        width=width,
-                        height=height,
-                        supports_streaming=True,
-                        thumb=thumb_image_path,
-                        reply_to_message_id=update.message.reply_to_message.message_id,
-                        progress=progress_for_pyrogram,
-                        progress_args=(
-                            Translation.UPLOAD_START,
-                            update.message,
-                            start_time
-                        )
+                )
+            elif tg_send_type == "video":
+                sent = await bot.send_video(
+                    chat_id=update.message.chat.id,
+                    video=download_directory,
+                    caption=description,
+                    duration=duration,
+                    width=width,
+                    height=height,
+                    supports_streaming=True,
+                    thumb=thumb_image_path,
+                    reply_to_message_id=update.message.reply_to_message.message_id,
+                    progress=progress_for_pyrogram,
+                    progress_args=(
+                        Translation.UPLOAD_START,
+                        update.message,
+                        start_time
                     )
-                else:
-                    logger.info("Did this happen? :\\")
-            except Exception as e:
-                logger.error(f"Failed to upload file: {e}")
+                )
+            else:
+                logger.info("Did this happen? :\\")
+        except Exception as e:
+            logger.error(f"Failed to upload file: {e}")
+        progress_service.clear(update.message.chat.id, update.message.message_id)
+        flight.file_id = media_file_id(sent)
+        if upload_id is not None:
+            await upload_cache.set(upload_id, sent)
+
+        end_two = datetime.now()
+        try:
+            os.remove(download_directory)
+            if os.path.exists(thumb_image_path):
+                os.remove(thumb_image_path)
+        except:
+            pass
+        time_taken_for_download = (end_one - start).seconds
+        time_taken_for_upload = (end_two - end_one).seconds
+        await bot.edit_message_text(
+            text=Translation.AFTER_SUCCESSFUL_UPLOAD_MSG_WITH_TS.format(time_taken_for_download, time_taken_for_upload),
+            chat_id=update.message.chat.id,
+            message_id=update.message.message_id,
+            disable_web_page_preview=True
+        )
+        return True
+
+    def streamable():
+        # a known size within Telegram's limit, and not an error page
+        return (
+            info is not None
+            and 0 < info["total_length"] <= Config.TG_MAX_FILE_SIZE
+            and "text" not in info["content_type"]
+        )
 
-            end_two = datetime.now()
-            try:
-                os.remove(download_directory)
-                if os.path.exists(thumb_image_path):
-                    os.remove(thumb_image_path)
-            except:
-                pass
-            time_taken_for_download = (end_one - start).seconds
-            time_taken_for_upload = (end_two - end_one).seconds
+    async def stream():
+        # upload parts as they arrive; fall back to the normal download when the size is unknown
+        if not streamable():
+            return await download()
+        total_length = info["total_length"]
+        session = get_session()
+        thumb = await Gthumb01(bot, update)
+        if thumb and not os.path.exists(thumb):
+            thumb = None
+        await bot.edit_message_text(
+            text=Translation.UPLOAD_START,
+            chat_id=update.message.chat.id,
+            message_id=update.message.message_id
+        )
+        start_time = time.time()
+
+        async def progress(current, total):
+            await progress_for_pyrogram(current, total, Translation.UPLOAD_START, update.message, start_time)
+
+        try:
+            input_file = await upload_stream(
+                bot,
+                stream_parts(session, info["url"], PART_SIZE),
+                total_length,
+                custom_file_name,
+                progress=progress
+            )
+            sent = await send_uploaded_document(
+                bot,
+                update.message.chat.id,
+                input_file,
+                custom_file_name,
+                info["content_type"].split(";")[0].strip(),
+                caption=description,
+                thumb=thumb,
+                reply_to_message_id=update.message.reply_to_message.message_id
+            )
+            flight.file_id = media_file_id(sent)
+            if upload_id is not None:
+                await upload_cache.set(upload_id, sent)
+        except Exception as e:
+            logger.error(f"Failed to stream {youtube_dl_url}: {e}")
             await bot.edit_message_text(
-                text=Translation.AFTER_SUCCESSFUL_UPLOAD_MSG_WITH_TS.format(time_taken_for_download, time_taken_for_upload),
+                text=Translation.NO_VOID_FORMAT_FOUND.format("Incorrect Link"),
                 chat_id=update.message.chat.id,
                 message_id=update.message.message_id,
                 disable_web_page_preview=True
             )
-    else:
+            return False
+        finally:
+            progress_service.clear(update.message.chat.id, update.message.message_id)
+            if thumb:
+                try:
+                    os.remove(thumb)
+                except OSError:
+                    pass
         await bot.edit_message_text(
-            text=Translation.NO_VOID_FORMAT_FOUND.format("Incorrect Link"),
+            text=Translation.STREAMED_IN.format(round(time.time() - start_time)),
             chat_id=update.message.chat.id,
             message_id=update.message.message_id,
             disable_web_page_preview=True
         )
+        return False
+
+    if Config.STREAM_UPLOADS and tg_send_type == "file":
+        download_stage = stream
+    else:
+        download_stage = download
+    settings = await user_settings.get(update.from_user.id)
+    # identical requests share one download even when the result cannot be cached
+    flight_key = upload_key(
+        youtube_dl_url, tg_send_type, youtube_dl_format, youtube_dl_ext,
+        custom_file_name, thumbnail=settings.thumbnail_unique_id
+    )
+    upload_id = None
+    # probed once here; the download stages reuse the result
+    info = None
+    session = get_session()
+    try:
+        info = await probe_url(session, youtube_dl_url)
+        expected_size = info["total_length"] or None
+        # without a validator the content behind the link may change
+        version = info["etag"] or info["last_modified"]
+        if version:
+            upload_id = upload_key(
+                youtube_dl_url, tg_send_type, youtube_dl_format, youtube_dl_ext,
+                custom_file_name, version, thumbnail=settings.thumbnail_unique_id
+            )
+    except Exception as e:
+        logger.warning(f"Failed to probe size of {youtube_dl_url}: {e}")
+        info = None
+        expected_size = None
+    while True:
+        if upload_id is not None and await upload_cache.send(
+            bot, upload_id, update.message.chat.id, description,
+            update.message.reply_to_message.message_id
+        ):
+            sent_from_cache = True
+            break
+        flight, leading = in_flight.claim(flight_key, update.message.chat.id, update.message.message_id)
+        if leading:
+            sent_from_cache = False
+            break
+        # waiting on the leader needs no scheduler slot
+        async with job_scheduler.released(update.from_user.id):
+            file_id = await in_flight.follow(flight, update.message.chat.id, update.message.message_id)
+        if file_id is not None and await upload_cache.resend(
+            bot, file_id, update.message.chat.id, description,
+            update.message.reply_to_message.message_id
+        ):
+            sent_from_cache = True
+            break
+    if sent_from_cache:
+        await bot.edit_message_text(
+            text=Translation.UPLOADED_FROM_CACHE,
+            chat_id=update.message.chat.id,
+            message_id=update.message.message_id
+        )
+        return
+    if download_stage is stream and streamable():
+        # streamed uploads never touch the disk
+        expected_size = 0
+    try:
+        reservation = await disk_manager.reserve(update.from_user.id, expected_size)
+        if reservation is None:
+            await bot.edit_message_text(
+                text=Translation.NO_DISK_SPACE,
+                chat_id=update.message.chat.id,
+                message_id=update.message.message_id
+            )
+            return
+        reservation.track(download_directory)
+        reservation.track(thumb_path(update))
         try:
-           shutil.rmtree(tmp_directory_for_each_user)
-        except:
-           pass
-    
+            await job_pipeline.process({"download": download_stage, "postprocess": postprocess, "upload": upload})
+        finally:
+            await reservation.release()
+    finally:
+        in_flight.land(flight_key, flight)
 
 
-async def download_coroutine(bot, session, url, file_name, chat_id, message_id, start):
-    downloaded = 0
-    display_message = ""
-    first_message = True
-    try:
-        async with session.get(url, timeout=Config.PROCESS_MAX_TIMEOUT) as response:
-            total_length = int(response.headers["Content-Length"])
-            content_type = response.headers["Content-Type"]
-            if "text" in content_type and total_length < 500:
-                return await response.release()
-            
-            with open(file_name, "wb") as f_handle:
-                while True:
-                    chunk = await response.content.read(Config.CHUNK_SIZE)
-                    if not chunk:
-                        break
-                    f_handle.write(chunk)
-                    downloaded += Config.CHUNK_SIZE
-                    now = time.time()
-                    diff = now - start
-                    if round(diff % 5.00) == 0 or downloaded == total_length:
-                        percentage = downloaded * 100 / total_length
-                        speed = downloaded / diff
-                        elapsed_time = round(diff) * 1000
-                        time_to_completion = round(
-                            (total_length - downloaded) / speed) * 1000
-                        estimated_total_time = elapsed_time + time_to_completion
-                        try:
-                            current_message = """**😈 Download Status 😈**
+async def download_coroutine(bot, session, url, file_name, chat_id, message_id, start, info=None):
+
+    async def progress(downloaded, total_length):
+        diff = time.time() - start
+        speed = downloaded / diff if diff > 0 else 0
+        elapsed_time = round(diff) * 1000
+        time_to_completion = round(
+            (total_length - downloaded) / speed) * 1000 if speed > 0 and total_length else 0
+        estimated_total_time = elapsed_time + time_to_completion
+        current_message = """**😈 Download Status 😈**
     File Size: {}
     Downloaded: {}
     ETA: {}""".format(
        humanbytes(total_length),
        humanbytes(downloaded),
        TimeFormatter(estimated_total_time)
-    )                     
-                            if first_message:
-                                await bot.edit_message_text(
-                                   chat_id,
-                                    message_id,
-                                     text="""Initiating Download...
-    URL: {}
-    File Size: {}""".format(url, humanbytes(total_length))
-                                )
-                                first_message = False
-                            if current_message != display_message:
-                                await bot.edit_message_text(
-                                    chat_id,
-                                    message_id,
-                                    text=current_message
-                                )
-                                display_message = current_message
-                        except Exception as e:
-                            logger.info(str(e))
-                            pass
-            return True
+    )
+        progress_service.publish(bot, chat_id, message_id, current_message)
+
+    try:
+        return await download_file(session, url, file_name, progress=progress, info=info)
+    except asyncio.TimeoutError:
+        raise
     except Exception as e:
         logger.error(f"Failed to download url {url}: {e}")
-        return False
\ No newline at end of file
+        return False
+    finally:
+        progress_service.clear(chat_id, message_id)
\ No newline at end of file
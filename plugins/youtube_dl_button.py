@@ -16,19 +16,26 @@ from database.access import clinton
 from translation import Translation
 from plugins.custom_thumbnail import *
 from pyrogram.types import InputMediaPhoto
-from helper_funcs.display_progress import progress_for_pyrogram, humanbytes
+from helper_funcs.display_progress import progress_for_pyrogram, progress_service, humanbytes
+from helper_funcs.pipeline import job_pipeline
+from helper_funcs.client_pool import client_pool
+from helper_funcs.disk_manager import disk_manager
+from helper_funcs.upload_cache import upload_cache, upload_key, media_file_id
+from helper_funcs.single_flight import in_flight
+from helper_funcs.scheduler import job_scheduler
+from database.user_settings import user_settings
+from helper_funcs.ytdl_engine import ytdl_engine
+from helper_funcs.probe_store import probe_store
 import re
 
 
 async def youtube_dl_call_back(bot, update):
     cb_data = update.data
     tg_send_type, youtube_dl_format, youtube_dl_ext = cb_data.split("|")
-    save_ytdl_json_path = Config.DOWNLOAD_LOCATION + "/" + str(update.from_user.id) + ".json"
     tmp_directory_for_each_user = Config.DOWNLOAD_LOCATION + "/" + str(update.from_user.id)
-    try:
-        with open(save_ytdl_json_path, "r", encoding="utf8") as f:
-            response_json = json.load(f)
-    except (FileNotFoundError) as e:
+    probe_key = (update.message.chat.id, update.message.reply_to_message.message_id)
+    response_json = await probe_store.get(*probe_key)
+    if response_json is None:
         await update.message.delete(True)
         return False
     youtube_dl_url = update.message.reply_to_message.text
@@ -90,150 +97,221 @@ async def youtube_dl_call_back(bot, update):
     else:
         file_name = custom_file_name
     download_directory = tmp_directory_for_each_user + "/" + str(file_name)
-    command_to_exec = []
-    if tg_send_type == "audio":
-        command_to_exec = ["yt-dlp", "-c",
-             "--max-filesize", str(Config.TG_MAX_FILE_SIZE),
-             "--prefer-ffmpeg", "--extract-audio",
-             "--audio-format", youtube_dl_ext,
-             "--audio-quality", youtube_dl_format,
-             youtube_dl_url, "-o", download_directory]
-    else:
-        minus_f_format = youtube_dl_format
-        if "youtu" in youtube_dl_url:
-            minus_f_format = youtube_dl_format + "+bestaudio"
-        command_to_exec = ["yt-dlp", "-c",
-            "--max-filesize", str(Config.TG_MAX_FILE_SIZE),
-            "--embed-subs", "-f", minus_f_format,
-            "--hls-prefer-ffmpeg", youtube_dl_url,
-            "-o", download_directory]
-
-    if Config.HTTP_PROXY != "":
-        command_to_exec.append("--proxy")
-        command_to_exec.append(Config.HTTP_PROXY)
-    if youtube_dl_username is not None:
-        command_to_exec.append("--username")
-        command_to_exec.append(youtube_dl_username)
-    if youtube_dl_password is not None:
-        command_to_exec.append("--password")
-        command_to_exec.append(youtube_dl_password)
-    command_to_exec.append("--no-warnings")
-    command_to_exec.append("--quiet")
     start = datetime.now()
-    process = await asyncio.create_subprocess_exec(*command_to_exec,
-    stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,)
-
-    stdout, stderr = await process.communicate()
-    e_response = stderr.decode().strip()
-    t_response = stdout.decode().strip()
-    ad_string_to_replace = "please report this issue on https://yt-dl.org/bug . Make sure you are using the latest version; see  https://yt-dl.org/update  on how to update. Be sure to call youtube-dl with the --verbose flag and include its complete output."
-    if e_response and ad_string_to_replace in e_response:
-        error_message = e_response.replace(ad_string_to_replace, "")
-        await bot.edit_message_text(
-        chat_id=update.message.chat.id,
-        message_id=update.message.message_id,
-        text=error_message)
-        asyncio.create_task(clendir(tmp_directory_for_each_user))
-        return False
-    if t_response:
-        asyncio.create_task(clendir(save_ytdl_json_path))
+    thumbnail = None
+    width = height = duration = 0
+
+    async def download():
+        nonlocal download_directory
+        download_start = time.time()
+
+        async def progress(downloaded, total):
+            await progress_for_pyrogram(downloaded, total, Translation.DOWNLOAD_START, update.message, download_start)
+
+        file_path, e_response = await ytdl_engine.download(
+            youtube_dl_url,
+            download_directory,
+            tg_send_type,
+            youtube_dl_format,
+            youtube_dl_ext,
+            username=youtube_dl_username,
+            password=youtube_dl_password,
+            progress=progress
+        )
+        progress_service.clear(update.message.chat.id, update.message.message_id)
+        ad_string_to_replace = "please report this issue on https://yt-dl.org/bug . Make sure you are using the latest version; see  https://yt-dl.org/update  on how to update. Be sure to call youtube-dl with the --verbose flag and include its complete output."
+        if e_response:
+            error_message = e_response.replace(ad_string_to_replace, "")
+            await bot.edit_message_text(
+            chat_id=update.message.chat.id,
+            message_id=update.message.message_id,
+            text=error_message)
+            return False
+        if file_path and os.path.exists(file_path):
+            download_directory = file_path
+            reservation.track(download_directory)
+        await probe_store.pop(*probe_key)
         try:
             file_size = os.stat(download_directory).st_size
         except FileNotFoundError:
             try:
                 download_directory = os.path.splitext(download_directory)[0] + "." + "mkv"
                 file_size = os.stat(download_directory).st_size
+                reservation.track(download_directory)
             except Exception:
                 await update.message.edit(text="File Not found 🤒")
-                asyncio.create_task(clendir(tmp_directory_for_each_user))
-                return
+                return False
         if file_size > Config.TG_MAX_FILE_SIZE:
+            time_taken_for_download = (datetime.now() - start).seconds
             await bot.edit_message_text(
             chat_id=update.message.chat.id,
             text=Translation.RCHD_TG_API_LIMIT.format(time_taken_for_download, humanbytes(file_size)),
             message_id=update.message.message_id)
-        else:
+            return False
+        return True
+
+    async def postprocess():
+        nonlocal thumbnail, width, height, duration
+        try:
+            if tg_send_type == "audio":
+                duration = await Mdata03(download_directory)
+                thumbnail = await Gthumb01(bot, update)
+            elif tg_send_type == "file":
+                thumbnail = await Gthumb01(bot, update)
+            elif tg_send_type == "vm":
+                width, duration = await Mdata02(download_directory)
+                thumbnail = await Gthumb02(bot, update, duration, download_directory)
+            elif tg_send_type == "video":
+                width, height, duration = await Mdata01(download_directory)
+                thumbnail = await Gthumb02(bot, update, duration, download_directory)
+        except Exception as e:
+            await bot.edit_message_text(text=Translation.ERROR.format(e),
+            chat_id=update.message.chat.id, message_id=update.message.message_id)
+            return False
+        return True
+
+    async def upload():
+        await bot.edit_message_text(
+        text=Translation.UPLOAD_START,
+        chat_id=update.message.chat.id,
+        message_id=update.message.message_id)
+        try:
+            start_time = time.time()
+            sent = None
+
+            async def progress(current, total):
+                await progress_for_pyrogram(current, total, Translation.UPLOAD_START, update.message, start_time)
+
+            if Config.UPLOAD_SESSIONS:
+                sent = await client_pool.send_file(
+                bot,
+                update.message.chat.id,
+                download_directory,
+                tg_send_type,
+                caption=description,
+                parse_mode="HTML",
+                duration=duration,
+                width=width,
+                height=height,
+                thumb=thumbnail,
+                reply_to_message_id=update.message.reply_to_message.message_id,
+                progress=progress)
+            elif tg_send_type == "audio":
+                sent = await bot.send_audio(
+                chat_id=update.message.chat.id,
+                audio=download_directory,
+                caption=description,
+                parse_mode="HTML",
+                duration=duration,
+                thumb=thumbnail,
+                reply_to_message_id=update.message.reply_to_message.message_id,
+                progress=progress_for_pyrogram,
+                progress_args=(Translation.UPLOAD_START, update.message, start_time))
+            elif tg_send_type == "file":
+                sent = await bot.send_document(chat_id=update.message.chat.id,
+                document=download_directory,
+                thumb=thumbnail,
+                caption=description,
+                parse_mode="HTML",
+                reply_to_message_id=update.message.reply_to_message.message_id,
+                progress=progress_for_pyrogram,
+                progress_args=(Translation.UPLOAD_START, update.message, start_time))
+            elif tg_send_type == "vm":
+                sent = await bot.send_video_note(chat_id=update.message.chat.id,
+                video_note=download_directory,
+                duration=duration,
+                length=width,
+                thumb=thumbnail,
+                reply_to_message_id=update.message.reply_to_message.message_id,
+                progress=progress_for_pyrogram,
+                progress_args=(Translation.UPLOAD_START, update.message, start_time))
+            elif tg_send_type == "video":
+                sent = await bot.send_video(chat_id=update.message.chat.id,
+                video=download_directory,
+                caption=description,
+                parse_mode="HTML",
+                duration=duration,
+                width=width,
+                height=height,
+                thumb=thumbnail,
+                supports_streaming=True,
+                reply_to_message_id=update.message.reply_to_message.message_id,
+                progress=progress_for_pyrogram,
+                progress_args=(Translation.UPLOAD_START,
+                update.message, start_time) )
+
+            progress_service.clear(update.message.chat.id, update.message.message_id)
+            flight.file_id = media_file_id(sent)
+            await upload_cache.set(upload_id, sent)
+            asyncio.create_task(clendir(download_directory))
+            asyncio.create_task(clendir(thumbnail))
+            await bot.edit_message_text(
+            text="✅ Uploaded sucessfully ✓\n\nJOIN US : @LazyDeveloper",
+            chat_id=update.message.chat.id,
+            message_id=update.message.message_id,
+            disable_web_page_preview=True)
+
+        except Exception as e:
+            progress_service.clear(update.message.chat.id, update.message.message_id)
+            await bot.edit_message_text(text=Translation.ERROR.format(e),
+            chat_id=update.message.chat.id, message_id=update.message.message_id)
+        return True
+
+    settings = await user_settings.get(update.from_user.id)
+    upload_id = upload_key(
+        youtube_dl_url, tg_send_type, youtube_dl_format, youtube_dl_ext, file_name,
+        username=youtube_dl_username, password=youtube_dl_password,
+        thumbnail=settings.thumbnail_unique_id
+    )
+    while True:
+        if await upload_cache.send(
+            bot, upload_id, update.message.chat.id, description,
+            update.message.reply_to_message.message_id, parse_mode="HTML"
+        ):
+            sent_from_cache = True
+            break
+        flight, leading = in_flight.claim(upload_id, update.message.chat.id, update.message.message_id)
+        if leading:
+            sent_from_cache = False
+            break
+        # waiting on the leader needs no scheduler slot
+        async with job_scheduler.released(update.from_user.id):
+            file_id = await in_flight.follow(flight, update.message.chat.id, update.message.message_id)
+        if file_id is not None and await upload_cache.resend(
+            bot, file_id, update.message.chat.id, description,
+            update.message.reply_to_message.message_id, parse_mode="HTML"
+        ):
+            sent_from_cache = True
+            break
+    if sent_from_cache:
+        await probe_store.pop(*probe_key)
+        await bot.edit_message_text(
+        text=Translation.UPLOADED_FROM_CACHE,
+        chat_id=update.message.chat.id,
+        message_id=update.message.message_id)
+        return True
+    try:
+        expected_size = None
+        for f in response_json.get("formats", []):
+            if f.get("format_id") == youtube_dl_format and f.get("filesize"):
+                # the downloaded parts and the merged file can be on disk together
+                expected_size = f["filesize"] * 2
+        reservation = await disk_manager.reserve(update.from_user.id, expected_size)
+        if reservation is None:
             await bot.edit_message_text(
-            text=Translation.UPLOAD_START,
+            text=Translation.NO_DISK_SPACE,
             chat_id=update.message.chat.id,
             message_id=update.message.message_id)
-            try:
-                start_time = time.time()
-                if tg_send_type == "audio":
-                    duration = await Mdata03(download_directory)
-                    thumbnail = await Gthumb01(bot, update)
-                    if thumbnail:
-                        await bot.send_audio(
-                        chat_id=update.message.chat.id,
-                        audio=download_directory,
-                        caption=description,
-                        parse_mode="HTML",
-                        duration=duration,
-                        thumb=thumbnail,
-                        reply_to_message_id=update.message.reply_to_message.message_id,
-                        progress=progress_for_pyrogram,
-                        progress_args=(Translation.UPLOAD_START, update.message, start_time))
-                    else:
-                        await bot.send_audio(
-                            chat_id=update.message.chat.id,
-                            audio=download_directory,
-                            caption=description,
-                            parse_mode="HTML",
-                            duration=duration,
-                            reply_to_message_id=update.message.reply_to_message.message_id,
-                            progress=progress_for_pyrogram,
-                            progress_args=(Translation.UPLOAD_START, update.message, start_time))
-                elif tg_send_type == "file":
-                    thumbnail = await Gthumb01(bot, update)
-                    await bot.send_document(chat_id=update.message.chat.id,
-                    document=download_directory,
-                    thumb=thumbnail,
-                    caption=description,
-                    parse_mode="HTML",
-                    reply_to_message_id=update.message.reply_to_message.message_id,
-                    progress=progress_for_pyrogram,
-                    progress_args=(Translation.UPLOAD_START, update.message, start_time))
-                elif tg_send_type == "vm":
-                    width, duration = await Mdata02(download_directory)
-                    thumbnail = await Gthumb02(bot, update, duration, download_directory)
-                    await bot.send_video_note(chat_id=update.message.chat.id,
-                    video_note=download_directory,
-                    duration=duration,
-                    length=width,
-                    thumb=thumbnail,
-                    reply_to_message_id=update.message.reply_to_message.message_id,
-                    progress=progress_for_pyrogram,
-                    progress_args=(Translation.UPLOAD_START, update.message, start_time))
-                elif tg_send_type == "video":
-                    width, height, duration = await Mdata01(download_directory)
-                    thumbnail = await Gthumb02(bot, update, duration, download_directory)
-                    await bot.send_video(chat_id=update.message.chat.id,
-                    video=download_directory,
-                    caption=description,
-                    parse_mode="HTML",
-                    duration=duration,
-                    width=width,
-                    height=height,
-                    thumb=thumbnail,
-                    supports_streaming=True,
-                    reply_to_message_id=update.message.reply_to_message.message_id,
-                    progress=progress_for_pyrogram,
-                    progress_args=(Translation.UPLOAD_START,
-                    update.message, start_time) )
-
-                asyncio.create_task(clendir(download_directory))
-                asyncio.create_task(clendir(thumbnail))
-                await bot.edit_message_text(
-                text="✅ Uploaded sucessfully ✓\n\nJOIN US : @LazyDeveloper",
-                chat_id=update.message.chat.id,
-                message_id=update.message.message_id,
-                disable_web_page_preview=True)
-
-            except Exception as e:
-                asyncio.create_task(clendir(tmp_directory_for_each_user))
-                await bot.edit_message_text(text=Translation.ERROR.format(e),
-                chat_id=update.message.chat.id, message_id=update.message.message_id)
-                
+            return False
+        reservation.track(download_directory)
+        reservation.track(thumb_path(update))
+        try:
+            await job_pipeline.process({"download": download, "postprocess": postprocess, "upload": upload})
+        finally:
+            await reservation.release()
+    finally:
+        in_flight.land(upload_id, flight)
+
 #=================================
 async def clendir(directory):
 
@@ -13,6 +13,9 @@ from hachoir.parser import createParser
 from hachoir.metadata import extractMetadata
 from helper_funcs.display_progress import humanbytes
 from helper_funcs.help_uploadbot import DownLoadFile
+from helper_funcs.probe_cache import probe_cache
+from helper_funcs.probe_store import probe_store, trim_probe
+from helper_funcs.ytdl_engine import ytdl_engine
 from pyrogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from helper_funcs.display_progress import progress_for_pyrogram, humanbytes, TimeFormatter
 
@@ -67,57 +70,27 @@ async def echo(bot, update):
                 url = url[o:o + l]
     if url is None:
          url = re.search("(?P<url>https?://[^\s]+)", update.text).group("url")
-    if Config.HTTP_PROXY != "":
-        command_to_exec = [
-            "yt-dlp",
-            "--no-warnings",
-            "--youtube-skip-dash-manifest",
-            "-j",
-            url,
-            "--proxy", Config.HTTP_PROXY
-        ]
-    else:
-        command_to_exec = [
-            "yt-dlp",
-            "--no-warnings",
-            "--youtube-skip-dash-manifest",
-            "-j",
-            url
-        ]
-    if youtube_dl_username is not None:
-        command_to_exec.append("--username")
-        command_to_exec.append(youtube_dl_username)
-    if youtube_dl_password is not None:
-        command_to_exec.append("--password")
-        command_to_exec.append(youtube_dl_password)
-    process = await asyncio.create_subprocess_exec(*command_to_exec,
-    stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
-    stdout, stderr = await process.communicate()
-    e_response = stderr.decode().strip()
-    t_response = stdout.decode().strip()
-    if e_response and "nonnumeric port" not in e_response:
-        error_message = e_response.replace(Translation.ERROR_YTDLP, "")
-        if "This video is only available for registered users." in error_message:
-            error_message = Translation.SET_CUSTOM_USERNAME_PASSWORD
-        else:
-            error_message = "Invalid url 🚸</code>"
-        if imog:
-            await imog.delete(True)
-        await bot.send_message(chat_id=update.chat.id,
-        text=Translation.NO_VOID_FORMAT_FOUND.format(str(error_message)),
-        disable_web_page_preview=True, parse_mode="html",
-        reply_to_message_id=update.message_id)
-        return False
-    if t_response:
-        # logger.info(t_response)
-        x_reponse = t_response
-        if "\n" in x_reponse:
-            x_reponse, _ = x_reponse.split("\n")
-        response_json = json.loads(x_reponse)
-        save_ytdl_json_path = Config.DOWNLOAD_LOCATION + \
-            "/" + str(update.from_user.id) + ".json"
-        with open(save_ytdl_json_path, "w", encoding="utf8") as outfile:
-            json.dump(response_json, outfile, ensure_ascii=False)
+    response_json = await probe_cache.get(url, youtube_dl_username, youtube_dl_password)
+    if response_json is None:
+        response_json, e_response = await ytdl_engine.probe(url, youtube_dl_username, youtube_dl_password)
+        if e_response and "nonnumeric port" not in e_response:
+            error_message = e_response.replace(Translation.ERROR_YTDLP, "")
+            if "This video is only available for registered users." in error_message:
+                error_message = Translation.SET_CUSTOM_USERNAME_PASSWORD
+            else:
+                error_message = "Invalid url 🚸</code>"
+            if imog:
+                await imog.delete(True)
+            await bot.send_message(chat_id=update.chat.id,
+            text=Translation.NO_VOID_FORMAT_FOUND.format(str(error_message)),
+            disable_web_page_preview=True, parse_mode="html",
+            reply_to_message_id=update.message_id)
+            return False
+        # an empty probe marks a direct link
+        response_json = trim_probe(response_json) if response_json else {}
+        await probe_cache.set(url, youtube_dl_username, youtube_dl_password, response_json)
+    if response_json:
+        probe_store.put(update.chat.id, update.message_id, response_json)
         # logger.info(response_json)
         inline_keyboard = []
         duration = None
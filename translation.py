@@ -11,10 +11,14 @@ You can upload all https link including sony urls, voot, etc... & direct links \
     SET_CUSTOM_USERNAME_PASSWORD = """If you want to download premium videos, provide in the following format:
 URL | filename | username | password"""
     DOWNLOAD_START = "⚡️ **Downloading**..."
+    QUEUED = "⏳ **Queued**...\nPosition in queue: {}"
     UPLOAD_START = "⬇️ **Uploading**..."
     RCHD_TG_API_LIMIT = "Downloaded in {} seconds.\nDetected File Size: {}\nSorry. But, I cannot upload files greater than 2GB due to Telegram API limitations."
     AFTER_SUCCESSFUL_UPLOAD_MSG = "Thanks for using @\n\n<b>Join : @LazyDeveloper</b>"
     AFTER_SUCCESSFUL_UPLOAD_MSG_WITH_TS = "Downloaded in {} seconds.\nUploaded in {} seconds."
+    STREAMED_IN = "Downloaded and uploaded in {} seconds."
+    UPLOADED_FROM_CACHE = "⚡️ Sent instantly, this file was uploaded before."
+    NO_DISK_SPACE = "😔 The server is out of disk space right now. Please try again later."
     SAVED_CUSTOM_THUMB_NAIL = "Custom thumbnail saved. This image will be used in both video & file ✅."
     DEL_ETED_CUSTOM_THUMB_NAIL = "Custom thumbnail cleared succesfully ✅."
     CUSTOM_CAPTION_UL_FILE = "{}"